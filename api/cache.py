@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import time
+from typing import Generic, Hashable, Tuple, TypeVar
+
+ValueT = TypeVar("ValueT")
+
+_missing = object()
+
+
+class LRUCache(Generic[ValueT]):
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._items: OrderedDict[Hashable, Tuple[float, ValueT]] = OrderedDict()
+
+    def get(self, key: Hashable, default: ValueT | None = None) -> ValueT | None:
+        item = self._items.get(key, _missing)
+        if item is _missing:
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return default
+
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: ValueT):
+        expires_at = time.monotonic() + self._ttl if self._ttl is not None else float("inf")
+        self._items[key] = (expires_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self._maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
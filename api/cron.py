@@ -0,0 +1,28 @@
+from datetime import datetime
+import functools
+import itertools
+from typing import Iterator, List
+
+from crontab import CronTab
+
+from api.config import CRON_CACHE_SIZE
+
+
+@functools.lru_cache(maxsize=CRON_CACHE_SIZE)
+def get_schedule(cron: str) -> CronTab:
+    return CronTab(cron)
+
+
+def iter_trigger_times(cron: str, after: datetime | None = None) -> Iterator[datetime]:
+    schedule = get_schedule(cron)
+    # Schedules restricted to past years or impossible dates stop firing.
+    while (after := schedule.next(now=after, default_utc=True, return_datetime=True)) is not None:
+        yield after
+
+
+def get_next_trigger_times(cron: str, count: int, after: datetime | None = None) -> List[datetime]:
+    return list(itertools.islice(iter_trigger_times(cron, after), count))
+
+
+def get_trigger_times_until(cron: str, until: datetime, after: datetime | None = None) -> List[datetime]:
+    return list(itertools.takewhile(lambda t: t <= until, iter_trigger_times(cron, after)))
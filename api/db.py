@@ -1,51 +1,305 @@
+import base64
+import binascii
 import contextlib
 import contextvars
+from datetime import datetime
 import functools
-from typing import Any, Tuple, TypeVar
+import json
+import operator
+import random
+import time
+from typing import Any, List, Tuple, TypeVar
 
 import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as sap
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.compiler import compiles
 import sqlalchemy.orm as sao
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.expression import ClauseElement
+from sqlalchemy.sql.expression import Executable
 
+from api.cache import LRUCache
+from api.config import COUNT_CACHE_SIZE
+from api.config import COUNT_CACHE_TTL
+from api.config import DATABASE_MAX_OVERFLOW
+from api.config import DATABASE_POOL_PRE_PING
+from api.config import DATABASE_POOL_RECYCLE
+from api.config import DATABASE_POOL_SIZE
+from api.config import DATABASE_POOL_TIMEOUT
+from api.config import DATABASE_REPLICA_URLS
+from api.config import DATABASE_STATEMENT_CACHE_SIZE
 from api.config import DATABASE_URL
+from api.errors import InvalidCursorError
+from api.metrics import instrument_engine
+from api.metrics import TRANSACTIONS
 
-engine = create_async_engine(DATABASE_URL)
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_checkout(self, wait_time: float):
+        self.checkouts += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa.exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+
+        self.stats.record_checkout(time.perf_counter() - started_at)
+        return connection
+
+
+def create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+        pool_timeout=DATABASE_POOL_TIMEOUT.total_seconds(),
+        pool_recycle=DATABASE_POOL_RECYCLE.total_seconds() if DATABASE_POOL_RECYCLE is not None else -1,
+        pool_pre_ping=DATABASE_POOL_PRE_PING,
+        connect_args={"prepared_statement_cache_size": DATABASE_STATEMENT_CACHE_SIZE},
+    )
+
+
+engine = create_engine(DATABASE_URL)
+replica_engines = [create_engine(url) for url in DATABASE_REPLICA_URLS]
+
+instrument_engine(engine, "primary")
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine, "replica")
+
+
+class Keyset:
+    """Total ordering of a query used for cursor based pagination.
+
+    Only the leading column may be nullable, the trailing columns must form a unique non-nullable key.
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self._columns = columns
+        self._descending = descending
+
+    def order(self, query):
+        return query.order_by(*[sa.desc(c) if self._descending else sa.asc(c) for c in self._columns])
+
+    def seek(self, query, cursor: str):
+        values = self._decode_cursor(cursor)
+        compare = operator.lt if self._descending else operator.gt
+
+        lead_column, lead_value = self._columns[0], values[0]
+        if len(self._columns) == 1:
+            return query.where(compare(lead_column, lead_value))
+
+        tail_columns, tail_values = self._columns[1:], values[1:]
+        if len(tail_columns) == 1:
+            tail_condition = compare(tail_columns[0], tail_values[0])
+        else:
+            tail_condition = compare(sa.tuple_(*tail_columns), sa.tuple_(*tail_values))
+
+        # Postgres puts nulls last in ascending order and first in descending order.
+        if lead_value is None:
+            condition = sa.and_(lead_column == None, tail_condition)
+            if self._descending:
+                condition = sa.or_(lead_column != None, condition)
+        else:
+            condition = compare(sa.tuple_(*self._columns), sa.tuple_(*values))
+            if not self._descending:
+                condition = sa.or_(condition, lead_column == None)
+
+        return query.where(condition)
+
+    def get_cursor(self, item) -> str:
+        values = [getattr(item, c.key) for c in self._columns]
+        return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self._columns):
+                raise ValueError("Unexpected cursor length.")
+
+            return [self._parse_value(c, v) for c, v in zip(self._columns, values)]
+        except (binascii.Error, ValueError, TypeError):
+            raise InvalidCursorError(f"{cursor} is not a valid cursor.")
+
+    @staticmethod
+    def _parse_value(column, value):
+        if value is None:
+            return None
+
+        python_type = column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+
+        return python_type(value)
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, query):
+        self.query = query
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kwargs) -> str:
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.query, **kwargs)}"
+
+
+# asyncpg refuses statements with more bind parameters than that.
+MAX_QUERY_PARAMETERS = 32767
+
+count_cache: LRUCache[int] = LRUCache(COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL.total_seconds())
 
 
 class Session(AsyncSession):
-    async def get_page(self, query, offset: int, limit: int) -> Tuple[Any, int]:
+    async def get_page(
+        self,
+        query,
+        offset: int,
+        limit: int,
+        keyset: Keyset | None = None,
+        cursor: str | None = None,
+    ) -> Tuple[List[Any], str | None]:
         paginated_query = query
-        if offset is not None:
+        if keyset is not None:
+            paginated_query = keyset.order(paginated_query)
+            if cursor is not None:
+                paginated_query = keyset.seek(paginated_query, cursor)
+
+        if offset is not None and cursor is None:
             paginated_query = paginated_query.offset(offset)
 
         if limit is not None:
             paginated_query = paginated_query.limit(limit)
 
-        return (
-            await self.scalars(paginated_query),
-            await self.scalar(sa.select(sa.func.count()).select_from(query.subquery())),
-        )
+        items = (await self.scalars(paginated_query)).all()
+        next_cursor = None
+        if keyset is not None and items and limit is not None and len(items) == limit:
+            next_cursor = keyset.get_cursor(items[-1])
+
+        return items, next_cursor
+
+    async def insert_many(self, model, rows: List[dict], ignore_conflicts: bool = False, returning=()) -> list:
+        if not rows:
+            return []
+
+        inserted = []
+        chunk_size = max(1, MAX_QUERY_PARAMETERS // len(rows[0]))
+        for offset in range(0, len(rows), chunk_size):
+            query = sap.insert(model).values(rows[offset : offset + chunk_size])
+            if ignore_conflicts:
+                query = query.on_conflict_do_nothing()
+
+            if returning:
+                inserted.extend((await self.execute(query.returning(*returning))).all())
+            else:
+                await self.execute(query)
+
+        return inserted
+
+    async def count(self, query) -> int:
+        compiled = query.compile(dialect=self.bind.dialect)
+        key = (compiled.string, tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+
+        count = count_cache.get(key)
+        if count is None:
+            count = await self.scalar(sa.select(sa.func.count()).select_from(query.subquery()))
+            count_cache.set(key, count)
+
+        return count
+
+    async def estimate_count(self, query) -> int:
+        return int((await self.explain(query))["Plan Rows"])
+
+    async def explain(self, query) -> dict:
+        plan = await self.scalar(Explain(query))
+        if isinstance(plan, (str, bytes)):
+            plan = json.loads(plan)
+
+        return plan[0]["Plan"]
 
 
 SessionLocal = sao.sessionmaker(autoflush=False, autocommit=False, bind=engine, class_=Session)
 FuncT = TypeVar("FuncT")
 
 
-current_session = contextvars.ContextVar("current_session")
+class SessionScope:
+    def __init__(self, read_primary: bool = False):
+        self._session: Session | None = None
+        self._replica_session: Session | None = None
+        self.read_primary = read_primary
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._session = SessionLocal()
+
+        return self._session
+
+    @property
+    def read_session(self) -> Session:
+        if self.read_primary or not replica_engines or (self._session is not None and self._session.in_transaction()):
+            return self.session
+
+        if self._replica_session is None:
+            self._replica_session = SessionLocal(bind=random.choice(replica_engines))
+
+        return self._replica_session
+
+    async def close(self):
+        for session in (self._session, self._replica_session):
+            if session is not None:
+                await session.close()
+
+        self._session = None
+        self._replica_session = None
+
+
+current_session_scope = contextvars.ContextVar("current_session_scope")
 
 
 def get_current_session() -> Session:
-    return current_session.get()
+    return current_session_scope.get().session
+
+
+def get_read_session() -> Session:
+    """Returns a replica session for read-only queries, or the primary one inside transactions and after writes."""
+    return current_session_scope.get().read_session
+
+
+def read_primary():
+    current_session_scope.get().read_primary = True
 
 
 @contextlib.asynccontextmanager
-async def override_session(session: Session):
-    token = current_session.set(session)
+async def session_scope(read_primary: bool = False):
+    scope = SessionScope(read_primary=read_primary)
+    token = current_session_scope.set(scope)
     try:
         yield
     finally:
-        current_session.reset(token)
+        current_session_scope.reset(token)
+        await scope.close()
 
 
 @contextlib.asynccontextmanager
@@ -59,8 +313,11 @@ async def transaction():
             yield
             await session.flush()
             await session.commit()
+            read_primary()
+            TRANSACTIONS.labels("commit").inc()
         except:
             await session.rollback()
+            TRANSACTIONS.labels("rollback").inc()
             raise
 
 
@@ -1,16 +1,24 @@
 from datetime import datetime
 from datetime import timedelta
 from enum import Enum
-from typing import Generic, List, TypeVar
+from typing import Dict, Generic, List, TypeVar
 from uuid import UUID
 
 import pydantic
 from pydantic import generics
 from pydantic import validator
-import sqlalchemy as sa
 
+from api.config import MAX_JOB_BATCH_SIZE
+from api.config import MAX_RUN_COMPLETION_BATCH_SIZE
+from api.config import MAX_RUN_HEARTBEAT_BATCH_SIZE
+from api.config import MAX_RUN_LEASE_BATCH_SIZE
 from api.config import MAX_RUN_LEASE_DURATION
+from api.config import MAX_RUN_LEASE_WAIT
+from api.config import MAX_RUN_RESULT_SIZE
 from api.config import MIN_RUN_LEASE_DURATION
+from api.cron import get_schedule
+from api.models import DEFAULT_PRIORITY
+from api.models import DEFAULT_QUEUE
 from api.models import Job
 from api.models import JobRun
 from api.models import JobRunStatus
@@ -22,8 +30,23 @@ class SortOrder(Enum):
     ASCENDING = "asc"
     DESCENDING = "desc"
 
-    def apply(self, column):
-        return sa.asc(column) if self == SortOrder.ASCENDING else sa.desc(column)
+
+class ExportFormat(Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class RunEventType(Enum):
+    SCHEDULED = "scheduled"
+    ASSIGNED = "assigned"
+    COMPLETED = "completed"
+    LEASE_EXPIRED = "lease_expired"
+
+
+class CountMode(Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
 
 
 class JobSortField(Enum):
@@ -37,27 +60,52 @@ class JobSortField(Enum):
 
 class JobRunSortField(Enum):
     SCHEDULED_AT = "scheduled_at"
+    PRIORITY = "priority"
 
     @property
-    def column(self):
+    def columns(self):
         if self == JobRunSortField.SCHEDULED_AT:
-            return JobRun.scheduled_at
+            return [JobRun.scheduled_at]
+
+        if self == JobRunSortField.PRIORITY:
+            return [JobRun.priority, JobRun.scheduled_at]
 
 
 class Page(generics.GenericModel, Generic[ItemT]):
-    count: int
+    count: int | None
+    count_estimated: bool = False
     results: List[ItemT]
+    next_cursor: str | None = None
 
 
 class JobScheduleRequestDto(pydantic.BaseModel):
     cron: str
 
+    @validator("cron")
+    def validate_cron(cls, value: str):
+        try:
+            schedule = get_schedule(value)
+        except ValueError:
+            raise ValueError(f"{value} is not a valid cron expression.")
+
+        if schedule.next(default_utc=True) is None:
+            raise ValueError(f"{value} never triggers.")
+
+        return value
+
 
 class JobRequestDto(pydantic.BaseModel):
     name: str
+    queue: str = DEFAULT_QUEUE
+    # Runs of jobs with a lower priority are assigned first.
+    priority: int = DEFAULT_PRIORITY
     schedules: List[JobScheduleRequestDto]
 
 
+# Jobs are validated one by one, so that an invalid job only fails its own item of the batch.
+JobBatchRequestDto = pydantic.conlist(dict, min_items=1, max_items=MAX_JOB_BATCH_SIZE)
+
+
 class JobScheduleDto(pydantic.BaseModel):
     id: UUID
     job_id: UUID
@@ -70,6 +118,8 @@ class JobScheduleDto(pydantic.BaseModel):
 class JobDto(pydantic.BaseModel):
     id: UUID
     name: str
+    queue: str
+    priority: int
     schedules: List[JobScheduleDto]
 
     class Config:
@@ -80,34 +130,139 @@ class JobRunDto(pydantic.BaseModel):
     id: UUID
     job_id: UUID
     job_schedule_id: UUID | None
+    queue: str
+    priority: int
     scheduled_at: datetime | None
     assigned_to: str | None
     assigned_until: datetime | None
     status: JobRunStatus
-    result: str | None
+    result_size: int | None
+    result_url: str | None = None
 
     class Config:
         orm_mode = True
 
 
+class RunEventDto(pydantic.BaseModel):
+    event: RunEventType
+    id: UUID
+    job_id: UUID
+    status: JobRunStatus
+    assigned_to: str | None
+
+
+def validate_lease_duration(value: timedelta) -> timedelta:
+    if value < MIN_RUN_LEASE_DURATION:
+        raise ValueError(f"Task lease duration must not be less than {MIN_RUN_LEASE_DURATION}.")
+
+    if value > MAX_RUN_LEASE_DURATION:
+        raise ValueError(f"Task lease duration must not be greater than {MAX_RUN_LEASE_DURATION}.")
+
+    return value
+
+
 class AssignJobRunDto(pydantic.BaseModel):
     worker: str
     lease_duration: timedelta
+    queues: List[str] | None = None
+
+    _validate_lease_duration = validator("lease_duration", allow_reuse=True)(validate_lease_duration)
+
+    @validator("queues")
+    def validate_queues(cls, value: List[str] | None):
+        if value is not None and not value:
+            raise ValueError("Queues must not be empty.")
+
+        return value
+
+
+class LeaseJobRunsDto(AssignJobRunDto):
+    # Runs are leased from one queue at a time, so leasing from all queues isn't supported.
+    queues: List[str] = [DEFAULT_QUEUE]
+    limit: int
+    wait: timedelta = timedelta()
+
+    @validator("limit")
+    def validate_limit(cls, value: int):
+        if value < 1:
+            raise ValueError("Lease limit must be a positive number.")
+
+        if value > MAX_RUN_LEASE_BATCH_SIZE:
+            raise ValueError(f"Lease limit must not be greater than {MAX_RUN_LEASE_BATCH_SIZE}.")
 
-    @validator("lease_duration")
-    def validate_lease_duration(cls, value: timedelta):
-        if value < MIN_RUN_LEASE_DURATION:
-            raise ValueError(f"Task lease duration must not be less than {MIN_RUN_LEASE_DURATION}.")
+        return value
+
+    @validator("wait")
+    def validate_wait(cls, value: timedelta):
+        if value < timedelta():
+            raise ValueError("Lease wait time must not be negative.")
 
-        if value > MAX_RUN_LEASE_DURATION:
-            raise ValueError(f"Task lease duration must not be greater than {MAX_RUN_LEASE_DURATION}.")
+        if value > MAX_RUN_LEASE_WAIT:
+            raise ValueError(f"Lease wait time must not be greater than {MAX_RUN_LEASE_WAIT}.")
 
         return value
 
 
+class HeartbeatJobRunsDto(pydantic.BaseModel):
+    worker: str
+    lease_duration: timedelta
+    # All runs leased by the worker are extended when omitted.
+    ids: pydantic.conlist(UUID, max_items=MAX_RUN_HEARTBEAT_BATCH_SIZE) | None = None
+
+    _validate_lease_duration = validator("lease_duration", allow_reuse=True)(validate_lease_duration)
+
+
+class HeartbeatJobRunsResultDto(pydantic.BaseModel):
+    extended: List[UUID]
+    # The given runs that aren't leased to the worker anymore, or its expired leases that weren't reaped yet when no
+    # runs are given.
+    lost: List[UUID]
+
+
 class CompleteJobRunDto(pydantic.BaseModel):
     worker: str
-    result: str
+    # Results uploaded through PUT /v1/runs/{id}/result are kept when omitted.
+    result: str | None = None
+
+    @validator("result")
+    def validate_result(cls, value: str | None):
+        if value is not None and len(value.encode()) > MAX_RUN_RESULT_SIZE:
+            raise ValueError(f"Run results can't be larger than {MAX_RUN_RESULT_SIZE} bytes.")
+
+        return value
+
+
+class CompleteJobRunBatchItemDto(CompleteJobRunDto):
+    id: UUID
+
+
+CompleteJobRunBatchDto = pydantic.conlist(
+    CompleteJobRunBatchItemDto,
+    min_items=1,
+    max_items=MAX_RUN_COMPLETION_BATCH_SIZE,
+)
+
+
+class BatchItemResultDto(generics.GenericModel, Generic[ItemT]):
+    id: UUID | None = None
+    result: ItemT | None = None
+    error: str | None = None
+
+
+class ReclaimedLeasesDto(pydantic.BaseModel):
+    count: int
+    workers: Dict[str, int]
+
+
+class PoolStatusDto(pydantic.BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_time_total: float
+    wait_time_max: float
 
 
 class ErrorResponseDto(pydantic.BaseModel):
@@ -118,12 +273,31 @@ class PaginationParamsDto(pydantic.BaseModel):
     offset: int
     limit: int
     sort_order: SortOrder
+    cursor: str | None
+    count: CountMode
 
 
 class JobQueryParamsDto(PaginationParamsDto):
     sort: JobSortField | None
 
 
-class JobRunQueryParamsDto(PaginationParamsDto):
-    sort: JobRunSortField | None
+class JobRunFiltersDto(pydantic.BaseModel):
     assignable_only: bool
+    job_id: List[UUID] | None
+    queue: List[str] | None
+    status: List[JobRunStatus] | None
+    assigned_to: str | None
+    scheduled_after: datetime | None
+    scheduled_before: datetime | None
+    completed_after: datetime | None
+    completed_before: datetime | None
+
+
+class JobRunQueryParamsDto(PaginationParamsDto, JobRunFiltersDto):
+    sort: JobRunSortField | None
+
+
+class JobRunExportParamsDto(JobRunFiltersDto):
+    sort: JobRunSortField | None
+    sort_order: SortOrder
+    format: ExportFormat
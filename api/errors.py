@@ -1,11 +1,10 @@
 from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 from starlette.responses import Response
 
 from api.dto import ErrorResponseDto
+from api.responses import DtoResponse
 
 
 class NotFoundError(RuntimeError):
@@ -16,6 +15,10 @@ class InvalidCronExpressionError(RuntimeError):
     pass
 
 
+class InvalidCursorError(RuntimeError):
+    pass
+
+
 class RunAssignmentFailed(RuntimeError):
     pass
 
@@ -24,8 +27,16 @@ class RunCompletionFailed(RuntimeError):
     pass
 
 
+class ResultTooLargeError(RuntimeError):
+    pass
+
+
+class RunEventsUnavailableError(RuntimeError):
+    pass
+
+
 def default_error_response(status: int, ex: Exception) -> Response:
-    return JSONResponse(status_code=status, content=jsonable_encoder(ErrorResponseDto(detail=str(ex))))
+    return DtoResponse(status_code=status, content=ErrorResponseDto(detail=str(ex)))
 
 
 def register_error_handlers(app: FastAPI):
@@ -37,6 +48,10 @@ def register_error_handlers(app: FastAPI):
     async def handle_invalid_cron_expression_error(request: Request, ex: InvalidCronExpressionError) -> Response:
         return default_error_response(status.HTTP_400_BAD_REQUEST, ex)
 
+    @app.exception_handler(InvalidCursorError)
+    async def handle_invalid_cursor_error(request: Request, ex: InvalidCursorError) -> Response:
+        return default_error_response(status.HTTP_400_BAD_REQUEST, ex)
+
     @app.exception_handler(RunAssignmentFailed)
     async def handle_run_assignment_failed(request: Request, ex: RunAssignmentFailed) -> Response:
         return default_error_response(status.HTTP_422_UNPROCESSABLE_ENTITY, ex)
@@ -44,3 +59,11 @@ def register_error_handlers(app: FastAPI):
     @app.exception_handler(RunCompletionFailed)
     async def handle_run_completion_failed(request: Request, ex: RunCompletionFailed) -> Response:
         return default_error_response(status.HTTP_422_UNPROCESSABLE_ENTITY, ex)
+
+    @app.exception_handler(ResultTooLargeError)
+    async def handle_result_too_large_error(request: Request, ex: ResultTooLargeError) -> Response:
+        return default_error_response(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, ex)
+
+    @app.exception_handler(RunEventsUnavailableError)
+    async def handle_run_events_unavailable_error(request: Request, ex: RunEventsUnavailableError) -> Response:
+        return default_error_response(status.HTTP_503_SERVICE_UNAVAILABLE, ex)
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from fastapi import FastAPI
+
+from api.config import RUN_MATERIALIZER_BATCH_SIZE
+from api.config import RUN_MATERIALIZER_ENABLED
+from api.config import RUN_MATERIALIZER_HORIZON
+from api.config import RUN_MATERIALIZER_INTERVAL
+from api.db import session_scope
+from api.services import JobRunService
+from api.tasks import PeriodicTask
+from api.tasks import register_periodic_task
+
+
+async def materialize_runs():
+    service = JobRunService()
+    until = datetime.utcnow() + RUN_MATERIALIZER_HORIZON
+
+    async with session_scope():
+        after = await service.materialize_runs(until, None, RUN_MATERIALIZER_BATCH_SIZE)
+        while after is not None:
+            after = await service.materialize_runs(until, after, RUN_MATERIALIZER_BATCH_SIZE)
+
+
+def register_run_materializer(app: FastAPI):
+    if RUN_MATERIALIZER_ENABLED:
+        register_periodic_task(app, PeriodicTask(materialize_runs, RUN_MATERIALIZER_INTERVAL))
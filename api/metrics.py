@@ -0,0 +1,58 @@
+import time
+
+from fastapi import FastAPI
+import prometheus_client
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.responses import Response
+
+REQUEST_DURATION = prometheus_client.Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ["method", "route"],
+)
+STATEMENT_DURATION = prometheus_client.Histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing database statements.",
+    ["database", "operation"],
+)
+TRANSACTIONS = prometheus_client.Counter(
+    "db_transactions_total",
+    "Finished database transactions.",
+    ["outcome"],
+)
+RUN_ASSIGNMENT_FAILURES = prometheus_client.Counter(
+    "job_run_assignment_failures_total",
+    "Runs that could not be assigned to a worker.",
+    ["worker"],
+)
+RUN_COMPLETION_FAILURES = prometheus_client.Counter(
+    "job_run_completion_failures_total",
+    "Runs that could not be completed by a worker.",
+    ["worker"],
+)
+QUEUED_RUNS = prometheus_client.Gauge(
+    "job_runs_queued",
+    "Unfinished runs by state, refreshed periodically.",
+    ["state"],
+)
+
+
+def instrument_engine(engine: AsyncEngine, database: str):
+    @sa.event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_statement_timer(connection, cursor, statement, parameters, context, executemany):
+        context.statement_started_at = time.perf_counter()
+
+    @sa.event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def stop_statement_timer(connection, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        STATEMENT_DURATION.labels(database, operation).observe(time.perf_counter() - context.statement_started_at)
+
+
+def register_metrics(app: FastAPI):
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics() -> Response:
+        return Response(
+            prometheus_client.generate_latest(),
+            headers={"Content-Type": prometheus_client.CONTENT_TYPE_LATEST},
+        )
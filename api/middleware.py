@@ -1,14 +1,29 @@
 from fastapi import FastAPI
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
 
-from api.db import override_session
-from api.db import SessionLocal
+from api.db import session_scope
+
+# Clients set this header to read from the primary right after writing through another request.
+READ_YOUR_WRITES_HEADER = b"x-read-your-writes"
+
+
+class SessionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        read_primary = headers.get(READ_YOUR_WRITES_HEADER, b"").lower() in (b"1", b"true")
+        async with session_scope(read_primary=read_primary):
+            await self.app(scope, receive, send)
 
 
 def register_middleware(app: FastAPI):
-    @app.middleware("http")
-    async def configure_session(request: Request, next) -> Response:
-        async with SessionLocal() as session:
-            async with override_session(session):
-                return await next(request)
+    app.add_middleware(SessionMiddleware)
@@ -8,6 +8,9 @@ import sqlalchemy.orm as sao
 
 Base = sao.declarative_base()
 
+DEFAULT_QUEUE = "default"
+DEFAULT_PRIORITY = 0
+
 
 class JobRunStatus(Enum):
     SCHEDULED = "scheduled"
@@ -17,16 +20,19 @@ class JobRunStatus(Enum):
 
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (sa.Index("ix_jobs_name_id", "name", "id"),)
 
     id = sa.Column(sap.UUID(as_uuid=True), primary_key=True)
     name = sa.Column(sa.String(length=100))
+    queue = sa.Column(sa.String(length=100), nullable=False, server_default=DEFAULT_QUEUE)
+    priority = sa.Column(sa.Integer, nullable=False, server_default=str(DEFAULT_PRIORITY))
 
     schedules = sao.relationship("JobSchedule", back_populates="job")
     runs = sao.relationship("JobRun", back_populates="job")
 
     @classmethod
-    def create(cls, name: str) -> "Job":
-        return cls(id=uuid.uuid4(), name=name)
+    def create(cls, name: str, queue: str = DEFAULT_QUEUE, priority: int = DEFAULT_PRIORITY) -> "Job":
+        return cls(id=uuid.uuid4(), name=name, queue=queue, priority=priority)
 
 
 class JobSchedule(Base):
@@ -35,6 +41,8 @@ class JobSchedule(Base):
     id = sa.Column(sap.UUID(as_uuid=True), primary_key=True)
     job_id = sa.Column(sa.ForeignKey("jobs.id"), index=True)
     cron = sa.Column(sa.String(length=100))
+    # Set once the cron expression can't trigger anymore, so that the materializer skips the schedule.
+    exhausted = sa.Column(sa.Boolean, nullable=False, server_default=sa.false())
 
     job = sao.relationship("Job", back_populates="schedules")
     runs = sao.relationship("JobRun", back_populates="schedule")
@@ -46,16 +54,91 @@ class JobSchedule(Base):
 
 class JobRun(Base):
     __tablename__ = "job_runs"
+    __table_args__ = (
+        sa.Index("ix_job_runs_scheduled_at_id", "scheduled_at", "id"),
+        sa.Index("ix_job_runs_job_id_scheduled_at_id", "job_id", "scheduled_at", "id"),
+        sa.Index("ix_job_runs_completed_at_id", "completed_at", "id"),
+        sa.Index("ix_job_runs_job_schedule_id_scheduled_at", "job_schedule_id", "scheduled_at", unique=True),
+        sa.Index(
+            "ix_job_runs_scheduled_scheduled_at_id",
+            "scheduled_at",
+            "id",
+            postgresql_where=sa.text("status = 'SCHEDULED'"),
+        ),
+        sa.Index(
+            "ix_job_runs_scheduled_priority_scheduled_at_id",
+            "priority",
+            "scheduled_at",
+            "id",
+            postgresql_where=sa.text("status = 'SCHEDULED'"),
+        ),
+        # Workers of a queue only touch its part of the index, away from the pages of the other queues.
+        sa.Index(
+            "ix_job_runs_scheduled_queue_assignment_order",
+            "queue",
+            "priority",
+            "fair_share_at",
+            "scheduled_at",
+            "id",
+            postgresql_where=sa.text("status = 'SCHEDULED' AND fair_share_at IS NOT NULL"),
+        ),
+        sa.Index(
+            "ix_job_runs_scheduled_queue_scheduled_at_id",
+            "queue",
+            "scheduled_at",
+            "id",
+            postgresql_where=sa.text("status = 'SCHEDULED'"),
+        ),
+        sa.Index(
+            "ix_job_runs_head_job_id",
+            "job_id",
+            postgresql_where=sa.text("status = 'SCHEDULED' AND fair_share_at IS NOT NULL"),
+        ),
+        sa.Index(
+            "ix_job_runs_waiting_job_id_scheduled_at_id",
+            "job_id",
+            "scheduled_at",
+            "id",
+            postgresql_where=sa.text("status = 'SCHEDULED' AND fair_share_at IS NULL"),
+        ),
+        sa.Index(
+            "ix_job_runs_assigned_assigned_to_scheduled_at_id",
+            "assigned_to",
+            "scheduled_at",
+            "id",
+            postgresql_where=sa.text("assigned_to IS NOT NULL"),
+        ),
+        sa.Index(
+            "ix_job_runs_in_progress_assigned_until",
+            "assigned_until",
+            postgresql_where=sa.text("status = 'IN_PROGRESS'"),
+        ),
+        sa.Index(
+            "ix_job_runs_in_progress_assigned_to",
+            "assigned_to",
+            postgresql_where=sa.text("status = 'IN_PROGRESS'"),
+        ),
+        {"postgresql_partition_by": "RANGE (scheduled_at)"},
+    )
 
     id = sa.Column(sap.UUID(as_uuid=True), primary_key=True)
-    job_id = sa.Column(sa.ForeignKey("jobs.id"), index=True)
+    job_id = sa.Column(sa.ForeignKey("jobs.id"))
     job_schedule_id = sa.Column(sa.ForeignKey("job_schedules.id"), nullable=True)
-    scheduled_at = sa.Column(sa.DateTime, index=True)
+    # Copied from the job so that assignment doesn't need to join the jobs.
+    queue = sa.Column(sa.String(length=100), nullable=False, server_default=DEFAULT_QUEUE)
+    priority = sa.Column(sa.Integer, nullable=False, server_default=str(DEFAULT_PRIORITY))
+    scheduled_at = sa.Column(sa.DateTime, primary_key=True)
+    # Position of the head run of a job in the assignment order within a priority. The other scheduled runs of the job
+    # wait for it to be assigned, then the next one goes behind the heads of the other jobs.
+    fair_share_at = sa.Column(sa.DateTime, nullable=True)
     completed_at = sa.Column(sa.DateTime, nullable=True)
     assigned_to = sa.Column(sa.String(length=100), nullable=True)
     assigned_until = sa.Column(sa.DateTime, nullable=True)
     status = sa.Column(sa.Enum(JobRunStatus))
-    result = sa.Column(sa.Text, nullable=True)
+    result_size = sa.Column(sa.BigInteger, nullable=True)
+
+    # The partition key has to be a part of the primary key, but runs are still identified by id alone.
+    __mapper_args__ = {"primary_key": [id]}
 
     job = sao.relationship("Job", back_populates="runs")
     schedule = sao.relationship("JobSchedule", back_populates="runs")
@@ -66,15 +149,28 @@ class JobRun(Base):
         job: Job,
         job_schedule: JobSchedule | None = None,
         scheduled_at: datetime | None = None,
+        fair_share_at: datetime | None = None,
     ) -> "JobRun":
+        scheduled_at = scheduled_at if scheduled_at is not None else datetime.utcnow()
         return cls(
             id=uuid.uuid4(),
             job_id=job.id,
             job_schedule_id=job_schedule.id if job_schedule is not None else None,
+            queue=job.queue,
+            priority=job.priority,
             scheduled_at=scheduled_at,
+            fair_share_at=fair_share_at,
             completed_at=None,
             job=job,
             schedule=job_schedule,
             status=JobRunStatus.SCHEDULED,
-            result=None,
+            result_size=None,
         )
+
+
+class JobRunResultChunk(Base):
+    __tablename__ = "job_run_result_chunks"
+
+    run_id = sa.Column(sap.UUID(as_uuid=True), primary_key=True)
+    index = sa.Column(sa.Integer, primary_key=True)
+    data = sa.Column(sa.LargeBinary, nullable=False)
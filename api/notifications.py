@@ -0,0 +1,195 @@
+import asyncio
+import contextlib
+import logging
+from typing import AsyncIterator, List, Set
+from uuid import UUID
+
+import asyncpg
+from fastapi import FastAPI
+import orjson
+import sqlalchemy as sa
+
+from api.config import DATABASE_URL
+from api.config import RUN_EVENT_CHANNEL
+from api.config import RUN_EVENT_QUEUE_SIZE
+from api.config import RUN_EVENTS_ENABLED
+from api.config import RUN_NOTIFICATION_CHANNEL
+from api.config import RUN_NOTIFICATION_MAX_RECONNECT_INTERVAL
+from api.config import RUN_NOTIFICATION_RECONNECT_INTERVAL
+from api.db import get_current_session
+from api.dto import RunEventDto
+from api.errors import RunEventsUnavailableError
+from api.tasks import PeriodicTask
+from api.tasks import register_periodic_task
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects notification payloads of 8000 bytes or more.
+MAX_NOTIFICATION_PAYLOAD_SIZE = 7900
+
+
+class RunEventSubscription:
+    def __init__(self, job_ids: List[UUID] | None):
+        self._job_ids = {str(id) for id in job_ids} if job_ids else None
+        self._queue: asyncio.Queue[List[dict] | None] = asyncio.Queue(RUN_EVENT_QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, events: List[dict]):
+        if self._job_ids is not None:
+            events = [e for e in events if e["job_id"] in self._job_ids]
+
+        if not events or self.closed:
+            return
+
+        try:
+            self._queue.put_nowait(events)
+        except asyncio.QueueFull:
+            # Dropping events silently would leave the dashboard stale, rather make the client reconnect.
+            logger.warning("Closing a run event subscription that fell behind.")
+            self.close()
+
+    def close(self):
+        self.closed = True
+        with contextlib.suppress(asyncio.QueueFull):
+            self._queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> List[dict] | None:
+        """Returns the next events, an empty list after the timeout or None once the subscription is closed."""
+        if self.closed and self._queue.empty():
+            return None
+
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+
+class RunNotifier:
+    def __init__(self, database_url: str, channel: str, event_channel: str):
+        self._dsn = sa.engine.make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._channel = channel
+        self._event_channel = event_channel
+        self._connection: asyncpg.Connection | None = None
+        self._event = asyncio.Event()
+        self._subscriptions: Set[RunEventSubscription] = set()
+        self._reconnect_at = 0.0
+        self._reconnect_interval = RUN_NOTIFICATION_RECONNECT_INTERVAL.total_seconds()
+
+    async def connect(self):
+        """Listens for notifications unless already listening, backing off after failed attempts."""
+        loop = asyncio.get_running_loop()
+        if self._connection is not None or loop.time() < self._reconnect_at:
+            return
+
+        connection = None
+        try:
+            connection = await asyncpg.connect(self._dsn)
+            await connection.add_listener(self._channel, self._on_notification)
+            if RUN_EVENTS_ENABLED:
+                await connection.add_listener(self._event_channel, self._on_events)
+            connection.add_termination_listener(self._on_termination)
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning(
+                "Failed to listen for run notifications, polling for %.0fs before retrying: %s",
+                self._reconnect_interval,
+                e,
+            )
+            self._reconnect_at = loop.time() + self._reconnect_interval
+            self._reconnect_interval = min(
+                self._reconnect_interval * 2, RUN_NOTIFICATION_MAX_RECONNECT_INTERVAL.total_seconds()
+            )
+            if connection is not None:
+                connection.terminate()
+            return
+
+        self._connection = connection
+        self._reconnect_interval = RUN_NOTIFICATION_RECONNECT_INTERVAL.total_seconds()
+
+    async def stop(self):
+        self._close_subscriptions()
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            await connection.close()
+
+    def get_event(self) -> asyncio.Event:
+        """Returns the event set by the next notification, capture it before checking for runs to not miss any."""
+        return self._event
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def notify(self):
+        await get_current_session().execute(sa.select(sa.func.pg_notify(self._channel, "")))
+
+    async def publish(self, events: List[RunEventDto]):
+        """Sends run events to the subscribers of all processes once the current transaction commits."""
+        if not RUN_EVENTS_ENABLED or not events:
+            return
+
+        payloads, batch, batch_size = [], [], 0
+        for event in events:
+            data = orjson.dumps(event.dict())
+            if batch and batch_size + len(data) + 1 > MAX_NOTIFICATION_PAYLOAD_SIZE:
+                payloads.append(b"[" + b",".join(batch) + b"]")
+                batch, batch_size = [], 0
+
+            batch.append(data)
+            batch_size += len(data) + 1
+
+        payloads.append(b"[" + b",".join(batch) + b"]")
+        await get_current_session().execute(
+            sa.text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": self._event_channel, "payloads": [p.decode() for p in payloads]},
+        )
+
+    def subscribe(self, job_ids: List[UUID] | None, keepalive: float) -> AsyncIterator[List[dict]]:
+        """Returns the run events of the given jobs as they happen, and an empty list every keepalive seconds."""
+        if not RUN_EVENTS_ENABLED or self._connection is None:
+            raise RunEventsUnavailableError("Run events are not available, poll the runs instead.")
+
+        return self._iter_events(RunEventSubscription(job_ids), keepalive)
+
+    async def _iter_events(self, subscription: RunEventSubscription, keepalive: float) -> AsyncIterator[List[dict]]:
+        self._subscriptions.add(subscription)
+        try:
+            while (events := await subscription.get(keepalive)) is not None:
+                yield events
+        finally:
+            self._subscriptions.discard(subscription)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def _on_events(self, connection, pid, channel, payload):
+        events = orjson.loads(payload)
+        for subscription in list(self._subscriptions):
+            subscription.put(events)
+
+    def _on_termination(self, connection):
+        if connection is not self._connection:
+            return
+
+        logger.warning("Lost the run notification connection, falling back to polling until it reconnects.")
+        self._connection = None
+        self._close_subscriptions()
+
+    def _close_subscriptions(self):
+        for subscription in self._subscriptions:
+            subscription.close()
+
+
+run_notifier = RunNotifier(DATABASE_URL, RUN_NOTIFICATION_CHANNEL, RUN_EVENT_CHANNEL)
+
+
+def register_run_notifier(app: FastAPI):
+    # Connects on startup and reconnects once the connection is lost.
+    register_periodic_task(app, PeriodicTask(run_notifier.connect, RUN_NOTIFICATION_RECONNECT_INTERVAL))
+
+    @app.on_event("shutdown")
+    async def stop_run_notifier():
+        await run_notifier.stop()
@@ -0,0 +1,179 @@
+from datetime import datetime
+import logging
+from typing import List
+
+from fastapi import FastAPI
+import sqlalchemy as sa
+
+from api.config import JOB_RUN_PARTITION_MAINTENANCE_ENABLED
+from api.config import JOB_RUN_PARTITION_MAINTENANCE_INTERVAL
+from api.config import JOB_RUN_PARTITIONS_AHEAD
+from api.config import JOB_RUN_RETENTION
+from api.config import JOB_RUN_RETENTION_ARCHIVE
+from api.db import get_current_session
+from api.db import session_scope
+from api.db import transactional
+from api.models import JobRun
+from api.models import JobRunResultChunk
+from api.tasks import PeriodicTask
+from api.tasks import register_periodic_task
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = f"{JobRun.__tablename__}_p"
+ARCHIVE_PREFIX = f"{JobRun.__tablename__}_archive_p"
+CHUNK_ARCHIVE_PREFIX = f"{JobRunResultChunk.__tablename__}_archive_p"
+DEFAULT_PARTITION = f"{JobRun.__tablename__}_default"
+
+# Serializes partition maintenance between the API processes.
+PARTITION_MAINTENANCE_LOCK = 0x6A6F625F72756E73
+
+
+def get_month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def get_next_month_start(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def get_partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def get_partition_month(name: str) -> datetime | None:
+    try:
+        return datetime.strptime(name.removeprefix(PARTITION_PREFIX), "%Y%m")
+    except ValueError:
+        return None
+
+
+def is_job_run_partition(name: str) -> bool:
+    return name == DEFAULT_PARTITION or get_partition_month(name) is not None
+
+
+async def _lock_partitions() -> bool:
+    session = get_current_session()
+    if not await session.scalar(sa.select(sa.func.pg_try_advisory_xact_lock(PARTITION_MAINTENANCE_LOCK))):
+        return False
+
+    # Partition DDL locks job_runs, rather give up than queue the workers behind a long transaction.
+    await session.execute(sa.text("SET LOCAL lock_timeout = '5s'"))
+    return True
+
+
+async def _get_partitions() -> List[str]:
+    query = sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+    )
+    return (await get_current_session().scalars(query, {"table": JobRun.__tablename__})).all()
+
+
+@transactional
+async def _create_partition(month: datetime) -> bool:
+    if not await _lock_partitions():
+        return False
+
+    name = get_partition_name(month)
+    if name in await _get_partitions():
+        return False
+
+    # Runs scheduled before the partition existed landed in the default partition, which would make creating it fail.
+    # Create it detached, move those runs over and attach it, which checks that the default partition no longer
+    # holds any of its range.
+    session = get_current_session()
+    table = JobRun.__tablename__
+    columns = ", ".join(c.name for c in JobRun.__table__.columns)
+    bounds = {"start": month, "end": get_next_month_start(month)}
+    await session.execute(sa.text(f'CREATE TABLE "{name}" (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    await session.execute(
+        sa.text(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE scheduled_at >= :start AND scheduled_at < :end '
+            f'RETURNING {columns}) INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved'
+        ),
+        bounds,
+    )
+    await session.execute(
+        sa.text(
+            f'ALTER TABLE {table} ATTACH PARTITION "{name}" '
+            f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+        )
+    )
+    return True
+
+
+async def create_partitions(months_ahead: int) -> List[str]:
+    """Creates the missing partitions up to months_ahead, each in its own transaction."""
+    created = []
+    month = get_month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        if await _create_partition(month):
+            created.append(get_partition_name(month))
+
+        month = get_next_month_start(month)
+
+    return created
+
+
+@transactional
+async def detach_expired_partitions(before: datetime, archive: bool) -> List[str]:
+    if not await _lock_partitions():
+        return []
+
+    session = get_current_session()
+    detached = []
+    for name in await _get_partitions():
+        month = get_partition_month(name)
+        if month is None or get_next_month_start(month) > before:
+            continue
+
+        has_unfinished_runs = await session.scalar(
+            sa.text(f"SELECT EXISTS (SELECT FROM \"{name}\" WHERE status IN ('SCHEDULED', 'IN_PROGRESS'))")
+        )
+        if has_unfinished_runs:
+            logger.warning("Partition %s is past retention but still has unfinished runs.", name)
+            continue
+
+        # Result chunks don't reference the runs, so they have to be removed along with them.
+        chunks = JobRunResultChunk.__tablename__
+        if archive:
+            await session.execute(
+                sa.text(
+                    f'CREATE TABLE "{CHUNK_ARCHIVE_PREFIX}{month:%Y%m}" AS '
+                    f'SELECT c.* FROM {chunks} c JOIN "{name}" r ON r.id = c.run_id'
+                )
+            )
+
+        await session.execute(sa.text(f'DELETE FROM {chunks} c USING "{name}" r WHERE r.id = c.run_id'))
+        await session.execute(sa.text(f'ALTER TABLE {JobRun.__tablename__} DETACH PARTITION "{name}"'))
+        if archive:
+            await session.execute(sa.text(f'ALTER TABLE "{name}" RENAME TO "{ARCHIVE_PREFIX}{month:%Y%m}"'))
+        else:
+            await session.execute(sa.text(f'DROP TABLE "{name}"'))
+
+        detached.append(name)
+
+    return detached
+
+
+async def maintain_partitions():
+    async with session_scope():
+        try:
+            created = await create_partitions(JOB_RUN_PARTITIONS_AHEAD)
+            if created:
+                logger.info("Created job run partitions: %s.", ", ".join(created))
+        except Exception:
+            # Keep enforcing the retention, a failure to create partitions ahead only fills the default partition.
+            logger.exception("Failed to create job run partitions.")
+
+        if JOB_RUN_RETENTION:
+            detached = await detach_expired_partitions(datetime.utcnow() - JOB_RUN_RETENTION, JOB_RUN_RETENTION_ARCHIVE)
+            if detached:
+                action = "Archived" if JOB_RUN_RETENTION_ARCHIVE else "Dropped"
+                logger.info("%s expired job run partitions: %s.", action, ", ".join(detached))
+
+
+def register_partition_maintenance(app: FastAPI):
+    if JOB_RUN_PARTITION_MAINTENANCE_ENABLED:
+        register_periodic_task(app, PeriodicTask(maintain_partitions, JOB_RUN_PARTITION_MAINTENANCE_INTERVAL))
@@ -0,0 +1,153 @@
+from typing import List
+from uuid import UUID
+
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as sap
+
+from api.models import JobRun
+from api.models import JobRunStatus
+
+
+def has_status(*statuses: JobRunStatus):
+    # Statuses are rendered inline so that the planner can match them against the partial indexes on job_runs.
+    return JobRun.status.in_(
+        sa.bindparam(None, list(statuses), type_=JobRun.status.type, expanding=True, literal_execute=True),
+    )
+
+
+def is_due():
+    return JobRun.scheduled_at <= sa.func.now()
+
+
+def is_assignable():
+    # Expired leases are returned to the scheduled state by the lease reaper.
+    return has_status(JobRunStatus.SCHEDULED)
+
+
+def is_assignable_to(worker: str):
+    return sa.or_(
+        is_assignable(),
+        sa.and_(has_status(JobRunStatus.IN_PROGRESS), JobRun.assigned_to == worker),
+    )
+
+
+def is_head():
+    # Only the first scheduled run of each job is leased, the next one queues up behind the heads of the other jobs.
+    return JobRun.fair_share_at != None
+
+
+def assignment_order():
+    return JobRun.priority, JobRun.fair_share_at, JobRun.scheduled_at, JobRun.id
+
+
+def is_in_queues(queues: List[str] | None):
+    return JobRun.queue.in_(queues) if queues else sa.true()
+
+
+def _queue_priorities(queue: str):
+    # Postgres can't skip scan, so the priorities of the queue are walked with one index probe each.
+    def get_next_priority(*criteria):
+        return (
+            sa.select(sa.func.min(JobRun.priority))
+            .where(is_assignable(), is_head(), JobRun.queue == queue, *criteria)
+            .scalar_subquery()
+        )
+
+    priorities = sa.select(get_next_priority().label("priority")).cte(recursive=True)
+    return priorities.union_all(
+        sa.select(get_next_priority(JobRun.priority > priorities.c.priority)).where(priorities.c.priority != None)
+    )
+
+
+def _queue_lease_candidates(limit: int, queue: str):
+    # Heads are placed no earlier than they are due, so the probe of each priority stops at the ones materialized ahead.
+    # Priorities are probed in ascending order, so the limit stops at the first ones that fill it.
+    priorities = _queue_priorities(queue)
+    candidates = (
+        sa.select(*assignment_order())
+        .where(
+            is_assignable(),
+            is_head(),
+            JobRun.queue == queue,
+            JobRun.priority == priorities.c.priority,
+            JobRun.fair_share_at <= sa.func.now(),
+            is_due(),
+        )
+        .order_by(*assignment_order())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .lateral()
+    )
+    return sa.select(candidates).select_from(priorities).join(candidates, sa.true()).limit(limit).subquery()
+
+
+def lease_candidates(limit: int, queues: List[str]):
+    # An IN over the queues reads their parts of the index out of assignment order and sorts all due runs, rather
+    # read the first runs of each queue and merge them. Locked runs that don't make the cut are released on commit.
+    candidates = sa.union_all(*(sa.select(_queue_lease_candidates(limit, q)) for q in dict.fromkeys(queues))).subquery()
+    return (
+        sa.select(
+            candidates.c.id,
+            candidates.c.scheduled_at,
+        )
+        .order_by(*(candidates.c[c.name] for c in assignment_order()))
+        .limit(limit)
+    )
+
+
+def next_heads(job_ids: List[UUID]):
+    # The runs that take the place of the heads of the jobs once these are assigned.
+    jobs = sa.values(sa.column("job_id", sap.UUID(as_uuid=True)), name="jobs").data([(id,) for id in job_ids])
+    next_run = (
+        sa.select(JobRun.id, JobRun.scheduled_at)
+        .where(is_assignable(), sa.not_(is_head()), JobRun.job_id == jobs.c.job_id)
+        .order_by(JobRun.scheduled_at, JobRun.id)
+        .limit(1)
+        .lateral()
+    )
+    return sa.select(next_run).select_from(jobs).join(next_run, sa.true())
+
+
+def expired_leases(limit: int):
+    return (
+        sa.select(JobRun.id, JobRun.scheduled_at, JobRun.assigned_to)
+        .where(
+            has_status(JobRunStatus.IN_PROGRESS),
+            JobRun.assigned_until < sa.func.now(),
+        )
+        .order_by(JobRun.assigned_until)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def _next_scheduled_at(*criteria):
+    return (
+        sa.select(sa.func.min(JobRun.scheduled_at))
+        .where(
+            is_assignable(),
+            JobRun.scheduled_at > sa.func.now(),
+            *criteria,
+        )
+        .scalar_subquery()
+    )
+
+
+def next_run_delay(queues: List[str] | None = None):
+    if queues:
+        # Each queue is probed on its part of the index, an IN over the queues would read them all out of order.
+        next_scheduled_at = sa.func.least(*(_next_scheduled_at(JobRun.queue == q) for q in dict.fromkeys(queues)))
+    else:
+        next_scheduled_at = _next_scheduled_at()
+
+    return sa.select(sa.func.extract("epoch", next_scheduled_at - sa.func.now()))
+
+
+def queue_stats():
+    return sa.select(
+        sa.func.count().filter(has_status(JobRunStatus.SCHEDULED)).label("scheduled"),
+        sa.func.count().filter(has_status(JobRunStatus.IN_PROGRESS)).label("in_progress"),
+        sa.func.count().filter(sa.and_(has_status(JobRunStatus.SCHEDULED), is_due())).label("overdue"),
+    ).where(
+        has_status(JobRunStatus.SCHEDULED, JobRunStatus.IN_PROGRESS),
+    )
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import timedelta
+import sys
+from typing import Iterator, List, Set
+import uuid
+
+import sqlalchemy as sa
+
+from api import queries
+from api.db import SessionLocal
+from api.models import DEFAULT_QUEUE
+from api.models import JobRun
+from api.models import JobRunStatus
+from api.partitions import is_job_run_partition
+
+CHECKED_TABLES = {JobRun.__tablename__}
+
+# Each query is expected to use the given index, the partition indexes count as the partitioned index they belong to.
+CHECKED_QUERIES = {
+    "assignable runs": (
+        "ix_job_runs_scheduled_scheduled_at_id",
+        sa.select(JobRun).where(queries.is_assignable()).order_by(JobRun.scheduled_at, JobRun.id).limit(100),
+    ),
+    "assignable runs by priority": (
+        "ix_job_runs_scheduled_priority_scheduled_at_id",
+        sa.select(JobRun)
+        .where(queries.is_assignable())
+        .order_by(JobRun.priority, JobRun.scheduled_at, JobRun.id)
+        .limit(100),
+    ),
+    "lease candidates": (
+        "ix_job_runs_scheduled_queue_assignment_order",
+        queries.lease_candidates(100, [DEFAULT_QUEUE]),
+    ),
+    "lease candidates of queues": (
+        "ix_job_runs_scheduled_queue_assignment_order",
+        queries.lease_candidates(100, [DEFAULT_QUEUE, "other"]),
+    ),
+    "heads of jobs": (
+        "ix_job_runs_head_job_id",
+        sa.select(JobRun.job_id).where(
+            queries.is_assignable(), queries.is_head(), JobRun.job_id.in_([uuid.UUID(int=0)])
+        ),
+    ),
+    "next heads": (
+        "ix_job_runs_waiting_job_id_scheduled_at_id",
+        queries.next_heads([uuid.UUID(int=0)]),
+    ),
+    "expired leases": (
+        "ix_job_runs_in_progress_assigned_until",
+        queries.expired_leases(100),
+    ),
+    "next run delay": (
+        "ix_job_runs_scheduled_scheduled_at_id",
+        queries.next_run_delay(),
+    ),
+    "next run delay of queues": (
+        "ix_job_runs_scheduled_queue_scheduled_at_id",
+        queries.next_run_delay([DEFAULT_QUEUE, "other"]),
+    ),
+    "runs of a job": (
+        "ix_job_runs_job_id_scheduled_at_id",
+        sa.select(JobRun).where(JobRun.job_id == uuid.UUID(int=0)).order_by(JobRun.scheduled_at, JobRun.id).limit(100),
+    ),
+    "leases of a worker": (
+        "ix_job_runs_in_progress_assigned_to",
+        sa.select(JobRun.id).where(queries.has_status(JobRunStatus.IN_PROGRESS), JobRun.assigned_to == "worker"),
+    ),
+    "runs of a worker": (
+        "ix_job_runs_assigned_assigned_to_scheduled_at_id",
+        sa.select(JobRun).where(JobRun.assigned_to == "worker").order_by(JobRun.scheduled_at, JobRun.id).limit(100),
+    ),
+    "completed runs": (
+        "ix_job_runs_scheduled_at_id",
+        sa.select(JobRun)
+        .where(queries.has_status(JobRunStatus.COMPLETED))
+        .order_by(JobRun.scheduled_at, JobRun.id)
+        .limit(100),
+    ),
+    "recently completed runs": (
+        "ix_job_runs_completed_at_id",
+        sa.select(JobRun)
+        .where(JobRun.completed_at >= sa.func.now() - sa.literal(timedelta(hours=1)))
+        .order_by(JobRun.completed_at, JobRun.id)
+        .limit(100),
+    ),
+}
+
+
+def iter_seq_scans(plan: dict) -> Iterator[str]:
+    if plan["Node Type"] == "Seq Scan":
+        relation = plan["Relation Name"]
+        if relation in CHECKED_TABLES or is_job_run_partition(relation):
+            yield relation
+
+    for child in plan.get("Plans", []):
+        yield from iter_seq_scans(child)
+
+
+def iter_index_scans(plan: dict) -> Iterator[str]:
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+
+    for child in plan.get("Plans", []):
+        yield from iter_index_scans(child)
+
+
+async def get_partitioned_indexes(session, names: List[str]) -> Set[str]:
+    query = sa.text(
+        "SELECT coalesce(p.relname, c.relname) FROM pg_class c "
+        "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid LEFT JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE c.relname = ANY(CAST(:names AS text[]))"
+    )
+    return set((await session.scalars(query, {"names": names})).all())
+
+
+async def check_query_plans() -> bool:
+    passed = True
+    async with SessionLocal() as session:
+        async with session.begin():
+            # Sequential scans are only chosen when no index fits, so the result doesn't depend on table statistics.
+            await session.execute(sa.text("SET LOCAL enable_seqscan = off"))
+
+            for name, (index, query) in CHECKED_QUERIES.items():
+                plan = await session.explain(query)
+                tables = sorted(set(iter_seq_scans(plan)))
+                indexes = await get_partitioned_indexes(session, list(set(iter_index_scans(plan))))
+                if tables:
+                    passed = False
+                    print(f"FAIL {name}: sequential scan on {', '.join(tables)}")
+                elif index not in indexes:
+                    passed = False
+                    print(f"FAIL {name}: expected {index}, used {', '.join(sorted(indexes)) or 'no index'}")
+                else:
+                    print(f"OK   {name}")
+
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_query_plans()) else 1)
@@ -0,0 +1,22 @@
+from fastapi import FastAPI
+
+from api.config import QUEUE_METRICS_ENABLED
+from api.config import QUEUE_METRICS_INTERVAL
+from api.db import session_scope
+from api.metrics import QUEUED_RUNS
+from api.services import JobRunService
+from api.tasks import PeriodicTask
+from api.tasks import register_periodic_task
+
+
+async def refresh_queue_metrics():
+    async with session_scope():
+        stats = await JobRunService().get_queue_stats()
+
+    for state, count in stats.items():
+        QUEUED_RUNS.labels(state).set(count)
+
+
+def register_queue_metrics(app: FastAPI):
+    if QUEUE_METRICS_ENABLED:
+        register_periodic_task(app, PeriodicTask(refresh_queue_metrics, QUEUE_METRICS_INTERVAL))
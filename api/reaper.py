@@ -0,0 +1,19 @@
+from fastapi import FastAPI
+
+from api.config import LEASE_REAPER_BATCH_SIZE
+from api.config import LEASE_REAPER_ENABLED
+from api.config import LEASE_REAPER_INTERVAL
+from api.db import session_scope
+from api.services import JobRunService
+from api.tasks import PeriodicTask
+from api.tasks import register_periodic_task
+
+
+async def reap_expired_leases():
+    async with session_scope():
+        await JobRunService().reap_expired_leases(LEASE_REAPER_BATCH_SIZE)
+
+
+def register_lease_reaper(app: FastAPI):
+    if LEASE_REAPER_ENABLED:
+        register_periodic_task(app, PeriodicTask(reap_expired_leases, LEASE_REAPER_INTERVAL))
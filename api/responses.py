@@ -0,0 +1,106 @@
+import csv
+from datetime import datetime
+from enum import Enum
+import functools
+import hashlib
+import io
+import time
+from typing import Any, AsyncIterator, List
+
+from fastapi.routing import APIRoute
+import orjson
+import pydantic
+from starlette import status
+from starlette.responses import JSONResponse
+from starlette.responses import Response
+
+from api.metrics import REQUEST_DURATION
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, pydantic.BaseModel):
+        return value.dict()
+
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class DtoResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_encode, option=orjson.OPT_NON_STR_KEYS)
+
+
+def conditional_response(content: Any, if_none_match: str | None) -> Response:
+    etag = f'"{hashlib.sha1(orjson.dumps(content, default=_encode)).hexdigest()}"'
+    if if_none_match is not None:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return DtoResponse(content, headers={"ETag": etag})
+
+
+async def iter_ndjson(batches: AsyncIterator[List[pydantic.BaseModel]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield b"".join(orjson.dumps(item, default=_encode) + b"\n" for item in batch)
+
+
+async def iter_sse(batches: AsyncIterator[List[Any]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        if batch:
+            yield b"".join(b"data: " + orjson.dumps(item, default=_encode) + b"\n\n" for item in batch)
+        else:
+            # Comment lines keep idle connections from being closed by proxies.
+            yield b": keepalive\n\n"
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return value
+
+
+async def iter_csv(fields: List[str], batches: AsyncIterator[List[pydantic.BaseModel]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for batch in batches:
+        for item in batch:
+            writer.writerow(_csv_value(getattr(item, f)) for f in fields)
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class DtoRoute(APIRoute):
+    """Serializes endpoint results straight to a DtoResponse instead of validating them against response_model."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        status_code = kwargs.get("status_code") or 200
+        # include_router() builds the app level routes from the endpoints of the router level ones.
+        endpoint = getattr(endpoint, "dto_route_endpoint", endpoint)
+
+        @functools.wraps(endpoint)
+        async def serialize(*endpoint_args, **endpoint_kwargs):
+            result = await endpoint(*endpoint_args, **endpoint_kwargs)
+            return result if isinstance(result, Response) else DtoResponse(result, status_code=status_code)
+
+        serialize.dto_route_endpoint = endpoint
+        super().__init__(path, serialize, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        duration = {method: REQUEST_DURATION.labels(method, self.path_format) for method in self.methods}
+
+        async def timed_handler(request):
+            started_at = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                duration[request.method].observe(time.perf_counter() - started_at)
+
+        return timed_handler
@@ -1,59 +1,130 @@
+from datetime import datetime
+from typing import List
 from uuid import UUID
 
 from fastapi import APIRouter
 from fastapi import Body
 from fastapi import Depends
+from fastapi import Header
+from fastapi import Query
+from fastapi import Request
+from starlette.responses import StreamingResponse
 
+from api.config import LEASE_REAPER_BATCH_SIZE
+from api.db import engine
 from api.dto import AssignJobRunDto
+from api.dto import BatchItemResultDto
+from api.dto import CompleteJobRunBatchDto
 from api.dto import CompleteJobRunDto
+from api.dto import CountMode
+from api.dto import ExportFormat
+from api.dto import HeartbeatJobRunsDto
+from api.dto import HeartbeatJobRunsResultDto
+from api.dto import JobBatchRequestDto
 from api.dto import JobDto
 from api.dto import JobQueryParamsDto
 from api.dto import JobRequestDto
 from api.dto import JobRunDto
+from api.dto import JobRunExportParamsDto
+from api.dto import JobRunFiltersDto
 from api.dto import JobRunQueryParamsDto
 from api.dto import JobRunSortField
 from api.dto import JobSortField
+from api.dto import LeaseJobRunsDto
 from api.dto import Page
 from api.dto import PaginationParamsDto
+from api.dto import PoolStatusDto
+from api.dto import ReclaimedLeasesDto
 from api.dto import SortOrder
+from api.models import JobRunStatus
+from api.responses import conditional_response
+from api.responses import DtoRoute
+from api.responses import iter_csv
+from api.responses import iter_ndjson
+from api.responses import iter_sse
 from api.services import JobRunService
 from api.services import JobService
 
-router = APIRouter()
+router = APIRouter(route_class=DtoRoute)
 
 job_tags = ["Job"]
 run_tags = ["JobRun"]
+admin_tags = ["Admin"]
 
 
 def get_pagination_params(
     offset: int = 0,
     limit: int = 100,
     sort_order: SortOrder = SortOrder.ASCENDING,
+    cursor: str | None = None,
+    count: CountMode = CountMode.EXACT,
 ) -> PaginationParamsDto:
-    return PaginationParamsDto(offset=offset, limit=limit, sort_order=sort_order)
+    return PaginationParamsDto(offset=offset, limit=limit, sort_order=sort_order, cursor=cursor, count=count)
 
 
 def get_job_query_params(
     base: PaginationParamsDto = Depends(get_pagination_params),
     sort: JobSortField | None = None,
 ) -> JobQueryParamsDto:
-    return JobQueryParamsDto(offset=base.offset, limit=base.limit, sort_order=base.sort_order, sort=sort)
+    return JobQueryParamsDto(
+        offset=base.offset,
+        limit=base.limit,
+        sort_order=base.sort_order,
+        cursor=base.cursor,
+        count=base.count,
+        sort=sort,
+    )
+
+
+def get_job_run_filters(
+    assignable_only: bool = False,
+    job_id: List[UUID] | None = Query(None),
+    queue: List[str] | None = Query(None),
+    status: List[JobRunStatus] | None = Query(None),
+    assigned_to: str | None = None,
+    scheduled_after: datetime | None = None,
+    scheduled_before: datetime | None = None,
+    completed_after: datetime | None = None,
+    completed_before: datetime | None = None,
+) -> JobRunFiltersDto:
+    return JobRunFiltersDto(
+        assignable_only=assignable_only,
+        job_id=job_id,
+        queue=queue,
+        status=status,
+        assigned_to=assigned_to,
+        scheduled_after=scheduled_after,
+        scheduled_before=scheduled_before,
+        completed_after=completed_after,
+        completed_before=completed_before,
+    )
 
 
 def get_job_run_query_params(
     base: PaginationParamsDto = Depends(get_pagination_params),
+    filters: JobRunFiltersDto = Depends(get_job_run_filters),
     sort: JobRunSortField | None = None,
-    assignable_only: bool = False,
 ) -> JobRunQueryParamsDto:
     return JobRunQueryParamsDto(
         offset=base.offset,
         limit=base.limit,
         sort_order=base.sort_order,
+        cursor=base.cursor,
+        count=base.count,
         sort=sort,
-        assignable_only=assignable_only,
+        **filters.dict(),
     )
 
 
+def get_job_run_export_params(
+    filters: JobRunFiltersDto = Depends(get_job_run_filters),
+    sort: JobRunSortField | None = None,
+    sort_order: SortOrder = SortOrder.ASCENDING,
+    format: ExportFormat = ExportFormat.NDJSON,
+) -> JobRunExportParamsDto:
+    return JobRunExportParamsDto(sort=sort, sort_order=sort_order, format=format, **filters.dict())
+
+
 @router.get("/v1/jobs", response_model=Page[JobDto], tags=job_tags)
 async def list_jobs(
     params: JobQueryParamsDto = Depends(get_job_query_params),
@@ -63,8 +134,12 @@ async def list_jobs(
 
 
 @router.get("/v1/jobs/{id}", response_model=JobDto, tags=job_tags)
-async def get_job(id: UUID, service: JobService = Depends(JobService)) -> JobDto:
-    return await service.get_job(id)
+async def get_job(
+    id: UUID,
+    if_none_match: str | None = Header(None),
+    service: JobService = Depends(JobService),
+) -> JobDto:
+    return conditional_response(await service.get_job(id), if_none_match)
 
 
 @router.post("/v1/jobs", response_model=JobDto, tags=job_tags)
@@ -72,6 +147,14 @@ async def create_job(request: JobRequestDto = Body(), service: JobService = Depe
     return await service.create_job(request)
 
 
+@router.post("/v1/jobs/batch", response_model=List[BatchItemResultDto[JobDto]], tags=job_tags)
+async def create_jobs(
+    request: JobBatchRequestDto = Body(),
+    service: JobService = Depends(JobService),
+) -> List[BatchItemResultDto[JobDto]]:
+    return await service.create_jobs(request)
+
+
 @router.get("/v1/runs", response_model=Page[JobRunDto], tags=run_tags)
 async def list_runs(
     params: JobRunQueryParamsDto = Depends(get_job_run_query_params),
@@ -80,11 +163,92 @@ async def list_runs(
     return await service.list_runs(params)
 
 
+@router.get(
+    "/v1/runs/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}},
+    tags=run_tags,
+)
+async def export_runs(
+    params: JobRunExportParamsDto = Depends(get_job_run_export_params),
+    service: JobRunService = Depends(JobRunService),
+) -> StreamingResponse:
+    batches = service.export_runs(params)
+    if params.format == ExportFormat.CSV:
+        return StreamingResponse(iter_csv(list(JobRunDto.__fields__), batches), media_type="text/csv")
+
+    return StreamingResponse(iter_ndjson(batches), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/v1/runs/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+    tags=run_tags,
+)
+async def stream_run_events(
+    job_id: List[UUID] | None = Query(None),
+    service: JobRunService = Depends(JobRunService),
+) -> StreamingResponse:
+    return StreamingResponse(
+        iter_sse(service.stream_events(job_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/v1/runs/lease", response_model=List[JobRunDto], tags=run_tags)
+async def lease_runs(
+    request: LeaseJobRunsDto = Body(),
+    service: JobRunService = Depends(JobRunService),
+) -> List[JobRunDto]:
+    return await service.lease_runs(request)
+
+
+@router.post("/v1/runs/heartbeat", response_model=HeartbeatJobRunsResultDto, tags=run_tags)
+async def heartbeat_runs(
+    request: HeartbeatJobRunsDto = Body(),
+    service: JobRunService = Depends(JobRunService),
+) -> HeartbeatJobRunsResultDto:
+    return await service.heartbeat_runs(request)
+
+
 @router.get("/v1/runs/{id}", response_model=JobRunDto, tags=run_tags)
 async def get_run(id: UUID, service: JobRunService = Depends(JobRunService)) -> JobRunDto:
     return await service.get_run(id)
 
 
+@router.get(
+    "/v1/runs/{id}/result",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+    tags=run_tags,
+)
+async def get_run_result(id: UUID, service: JobRunService = Depends(JobRunService)) -> StreamingResponse:
+    size, content = await service.get_result(id)
+    return StreamingResponse(content, media_type="application/octet-stream", headers={"Content-Length": str(size)})
+
+
+@router.put(
+    "/v1/runs/{id}/result",
+    response_model=JobRunDto,
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+            "required": True,
+        },
+    },
+    tags=run_tags,
+)
+async def upload_run_result(
+    id: UUID,
+    worker: str,
+    request: Request,
+    service: JobRunService = Depends(JobRunService),
+) -> JobRunDto:
+    return await service.upload_result(id, worker, request.stream())
+
+
 @router.post("/v1/runs/{id}/assign", response_model=JobRunDto, tags=run_tags)
 async def assign_run(
     id: UUID,
@@ -94,6 +258,14 @@ async def assign_run(
     return await service.assign_run(id, request)
 
 
+@router.post("/v1/runs/complete/batch", response_model=List[BatchItemResultDto[JobRunDto]], tags=run_tags)
+async def complete_runs(
+    request: CompleteJobRunBatchDto = Body(),
+    service: JobRunService = Depends(JobRunService),
+) -> List[BatchItemResultDto[JobRunDto]]:
+    return await service.complete_runs(request)
+
+
 @router.post("/v1/runs/{id}/complete", response_model=JobRunDto, tags=run_tags)
 async def complete_run(
     id: UUID,
@@ -101,3 +273,24 @@ async def complete_run(
     service: JobRunService = Depends(JobRunService),
 ) -> JobRunDto:
     return await service.complete_run(id, request)
+
+
+@router.post("/v1/admin/reap-expired-leases", response_model=ReclaimedLeasesDto, tags=admin_tags)
+async def reap_expired_leases(service: JobRunService = Depends(JobRunService)) -> ReclaimedLeasesDto:
+    workers = await service.reap_expired_leases(LEASE_REAPER_BATCH_SIZE)
+    return ReclaimedLeasesDto(count=sum(workers.values()), workers=workers)
+
+
+@router.get("/v1/admin/db-pool", response_model=PoolStatusDto, tags=admin_tags)
+async def get_pool_status() -> PoolStatusDto:
+    pool = engine.pool
+    return PoolStatusDto(
+        size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+        checkouts=pool.stats.checkouts,
+        timeouts=pool.stats.timeouts,
+        wait_time_total=pool.stats.wait_time_total,
+        wait_time_max=pool.stats.wait_time_max,
+    )
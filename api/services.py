@@ -1,59 +1,195 @@
+import asyncio
+import collections
 from datetime import datetime
-from typing import List
+import logging
+import operator
+from typing import AsyncIterator, Dict, List, Set, Tuple
+import uuid
 from uuid import UUID
 
-from crontab import CronTab
 from fastapi import Depends
+import pydantic
 import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as sap
 import sqlalchemy.orm as sao
 
+from api import queries
+from api.cache import LRUCache
+from api.config import JOB_CACHE_SIZE
+from api.config import JOB_CACHE_TTL
+from api.config import MAX_RUN_RESULT_SIZE
+from api.config import RUN_EVENT_KEEPALIVE_INTERVAL
+from api.config import RUN_EXPORT_BATCH_SIZE
+from api.config import RUN_LEASE_WAIT_POLL_INTERVAL
+from api.config import RUN_RESULT_CHUNK_SIZE
+from api.cron import get_next_trigger_times
+from api.cron import get_trigger_times_until
 from api.db import get_current_session
+from api.db import get_read_session
+from api.db import Keyset
 from api.db import transactional
 from api.dto import AssignJobRunDto
+from api.dto import BatchItemResultDto
+from api.dto import CompleteJobRunBatchItemDto
 from api.dto import CompleteJobRunDto
+from api.dto import CountMode
+from api.dto import HeartbeatJobRunsDto
+from api.dto import HeartbeatJobRunsResultDto
 from api.dto import JobDto
 from api.dto import JobQueryParamsDto
 from api.dto import JobRequestDto
 from api.dto import JobRunDto
+from api.dto import JobRunExportParamsDto
+from api.dto import JobRunFiltersDto
 from api.dto import JobRunQueryParamsDto
+from api.dto import JobScheduleDto
 from api.dto import JobSortField
+from api.dto import LeaseJobRunsDto
 from api.dto import Page
+from api.dto import RunEventDto
+from api.dto import RunEventType
+from api.dto import SortOrder
 from api.errors import InvalidCronExpressionError
 from api.errors import NotFoundError
+from api.errors import ResultTooLargeError
 from api.errors import RunAssignmentFailed
 from api.errors import RunCompletionFailed
+from api.metrics import RUN_ASSIGNMENT_FAILURES
+from api.metrics import RUN_COMPLETION_FAILURES
 from api.models import Job
 from api.models import JobRun
+from api.models import JobRunResultChunk
 from api.models import JobRunStatus
 from api.models import JobSchedule
+from api.notifications import run_notifier
+
+logger = logging.getLogger(__name__)
+
+job_cache: LRUCache[JobDto] = LRUCache(JOB_CACHE_SIZE, ttl=JOB_CACHE_TTL.total_seconds())
+
+# Serializes the run materialization between the API processes.
+RUN_MATERIALIZER_LOCK = 0x6A6F625F73636865
+
+_job_run_columns = (
+    JobRun.id,
+    JobRun.job_id,
+    JobRun.job_schedule_id,
+    JobRun.queue,
+    JobRun.priority,
+    JobRun.scheduled_at,
+    JobRun.assigned_to,
+    JobRun.assigned_until,
+    JobRun.status,
+    JobRun.result_size,
+)
+
+
+def _with_result_url(run: JobRunDto) -> JobRunDto:
+    if run.result_size is not None:
+        run.result_url = f"/v1/runs/{run.id}/result"
+
+    return run
+
+
+def _split_result(result: str) -> List[bytes]:
+    data = result.encode()
+    return [data[offset : offset + RUN_RESULT_CHUNK_SIZE] for offset in range(0, len(data), RUN_RESULT_CHUNK_SIZE)]
+
+
+def _set_heads(rows: List[dict], heads: Set[UUID]):
+    """Makes the first new run of each job without a head its head."""
+    heads = set(heads)
+    for row in sorted(rows, key=operator.itemgetter("scheduled_at")):
+        if row["job_id"] not in heads:
+            row["fair_share_at"] = row["scheduled_at"]
+            heads.add(row["job_id"])
+
+
+def _run_events(event: RunEventType, runs) -> List[RunEventDto]:
+    return [
+        RunEventDto.construct(event=event, id=r.id, job_id=r.job_id, status=r.status, assigned_to=r.assigned_to)
+        for r in runs
+    ]
+
+
+async def _count(query, mode: CountMode) -> int | None:
+    session = get_read_session()
+    if mode == CountMode.EXACT:
+        return await session.count(query)
+
+    if mode == CountMode.ESTIMATE:
+        return await session.estimate_count(query)
+
+    return None
 
 
 class JobRunService:
     async def list_runs(self, params: JobRunQueryParamsDto) -> Page[JobRunDto]:
-        query = sa.select(JobRun)
-
-        if params.assignable_only:
-            query = query.where(
-                sa.or_(
-                    JobRun.assigned_to == None,
-                    JobRun.assigned_until == None,
-                    JobRun.assigned_until < sa.func.now(),
-                ),
-                JobRun.status.in_([JobRunStatus.SCHEDULED, JobRunStatus.IN_PROGRESS]),
-            )
+        query = self._filter_runs(sa.select(JobRun), params)
+        columns = [JobRun.id] if params.sort is None else [*params.sort.columns, JobRun.id]
+        items, next_cursor = await get_read_session().get_page(
+            query,
+            offset=params.offset,
+            limit=params.limit,
+            keyset=Keyset(*columns, descending=params.sort_order == SortOrder.DESCENDING),
+            cursor=params.cursor,
+        )
+        return Page(
+            count=await _count(query, params.count),
+            count_estimated=params.count == CountMode.ESTIMATE,
+            results=[_with_result_url(JobRunDto.from_orm(r)) for r in items],
+            next_cursor=next_cursor,
+        )
+
+    async def export_runs(self, params: JobRunExportParamsDto) -> AsyncIterator[List[JobRunDto]]:
+        columns = [JobRun.id] if params.sort is None else [*params.sort.columns, JobRun.id]
+        keyset = Keyset(*columns, descending=params.sort_order == SortOrder.DESCENDING)
+        query = keyset.order(self._filter_runs(sa.select(*_job_run_columns), params))
+
+        result = await get_read_session().stream(query)
+        async for rows in result.partitions(RUN_EXPORT_BATCH_SIZE):
+            yield [_with_result_url(JobRunDto.construct(**row._mapping)) for row in rows]
+
+    @staticmethod
+    def _filter_runs(query, filters: JobRunFiltersDto):
+        if filters.assignable_only:
+            query = query.where(queries.is_assignable())
+
+        if filters.job_id:
+            query = query.where(JobRun.job_id.in_(filters.job_id))
+
+        if filters.queue:
+            query = query.where(queries.is_in_queues(filters.queue))
 
-        if params.sort is not None:
-            query = query.order_by(params.sort_order.apply(params.sort.column))
+        if filters.status:
+            query = query.where(queries.has_status(*filters.status))
 
-        items, count = await get_current_session().get_page(query, offset=params.offset, limit=params.limit)
-        return Page(count=count, results=[JobRunDto.from_orm(r) for r in items])
+        if filters.assigned_to is not None:
+            query = query.where(JobRun.assigned_to == filters.assigned_to)
+
+        if filters.scheduled_after is not None:
+            query = query.where(JobRun.scheduled_at >= filters.scheduled_after)
+
+        if filters.scheduled_before is not None:
+            query = query.where(JobRun.scheduled_at < filters.scheduled_before)
+
+        if filters.completed_after is not None:
+            query = query.where(JobRun.completed_at >= filters.completed_after)
+
+        if filters.completed_before is not None:
+            query = query.where(JobRun.completed_at < filters.completed_before)
+
+        return query
 
     async def get_run(self, id: UUID) -> JobRunDto:
-        run = await get_current_session().get(JobRun, id)
+        run = await get_read_session().get(JobRun, id)
         if run is None:
             raise NotFoundError(f"Could not find job run {id}.")
 
-        return JobRunDto.from_orm(run)
+        return _with_result_url(JobRunDto.from_orm(run))
+
+    def stream_events(self, job_ids: List[UUID] | None) -> AsyncIterator[List[dict]]:
+        return run_notifier.subscribe(job_ids, RUN_EVENT_KEEPALIVE_INTERVAL.total_seconds())
 
     @transactional
     async def assign_run(self, id: UUID, request: AssignJobRunDto) -> JobRunDto:
@@ -69,29 +205,12 @@ class JobRunService:
             .where(
                 sa.and_(
                     JobRun.id == id,
-                    sa.or_(
-                        JobRun.assigned_to == None,
-                        JobRun.assigned_to == request.worker,
-                        JobRun.assigned_until == None,
-                        JobRun.assigned_until < sa.func.now(),
-                    ),
-                    sa.or_(
-                        JobRun.scheduled_at == None,
-                        JobRun.scheduled_at <= sa.func.now(),
-                    ),
-                    JobRun.status.in_([JobRunStatus.SCHEDULED, JobRunStatus.IN_PROGRESS]),
+                    queries.is_assignable_to(request.worker),
+                    queries.is_due(),
+                    queries.is_in_queues(request.queues),
                 ),
             )
-            .returning(
-                JobRun.id,
-                JobRun.job_id,
-                JobRun.job_schedule_id,
-                JobRun.scheduled_at,
-                JobRun.assigned_to,
-                JobRun.assigned_until,
-                JobRun.status,
-                JobRun.result,
-            )
+            .returning(*_job_run_columns, JobRun.fair_share_at)
             .execution_options(
                 synchronize_session=False,
             )
@@ -99,19 +218,138 @@ class JobRunService:
 
         row = (await get_current_session().execute(query)).one_or_none()
         if row is None:
+            RUN_ASSIGNMENT_FAILURES.labels(request.worker).inc()
             raise RunAssignmentFailed(f"Failed to assign run {id} to a worker.")
 
-        return JobRunDto(**{k: row[k] for k in row.keys()})
+        values = dict(row._mapping)
+        if values.pop("fair_share_at") is not None:
+            await self._promote_heads([row.job_id])
+
+        run = _with_result_url(JobRunDto.construct(**values))
+        await run_notifier.publish(_run_events(RunEventType.ASSIGNED, [run]))
+        return run
+
+    async def lease_runs(self, request: LeaseJobRunsDto) -> List[JobRunDto]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + request.wait.total_seconds()
+        while True:
+            event = run_notifier.get_event()
+            runs = await self._lease_runs(request)
+            remaining = deadline - loop.time()
+            if runs or remaining <= 0:
+                return runs
+
+            timeout = min(remaining, RUN_LEASE_WAIT_POLL_INTERVAL.total_seconds())
+            next_run_delay = await self._get_next_run_delay(request.queues)
+            if next_run_delay is not None:
+                timeout = min(timeout, max(next_run_delay, 0))
+
+            await run_notifier.wait(event, timeout)
+
+    @transactional
+    async def _lease_runs(self, request: LeaseJobRunsDto) -> List[JobRunDto]:
+        runs = []
+        # Each round leases at most one run per job, the next round the runs that took the place of the leased ones.
+        while len(runs) < request.limit:
+            query = (
+                sa.update(
+                    JobRun,
+                )
+                .values(
+                    assigned_to=request.worker,
+                    assigned_until=sa.func.now() + sa.literal(request.lease_duration, sa.Interval()),
+                    status=JobRunStatus.IN_PROGRESS,
+                )
+                .where(
+                    # Matching on the partition key as well only probes the partitions holding the candidates.
+                    sa.tuple_(JobRun.id, JobRun.scheduled_at).in_(
+                        queries.lease_candidates(request.limit - len(runs), request.queues)
+                    ),
+                )
+                .returning(*_job_run_columns)
+                .execution_options(
+                    synchronize_session=False,
+                )
+            )
+
+            rows = (await get_current_session().execute(query)).all()
+            runs.extend(_with_result_url(JobRunDto.construct(**row._mapping)) for row in rows)
+            if not rows or not await self._promote_heads([row.job_id for row in rows]):
+                break
+
+        await run_notifier.publish(_run_events(RunEventType.ASSIGNED, runs))
+        return runs
+
+    async def _promote_heads(self, job_ids: List[UUID]) -> bool:
+        """Makes the next runs of the jobs their heads, behind the heads of the other jobs. Returns whether any is due."""
+        query = (
+            sa.update(
+                JobRun,
+            )
+            .values(
+                fair_share_at=sa.func.greatest(sa.func.now(), JobRun.scheduled_at),
+            )
+            .where(
+                sa.tuple_(JobRun.id, JobRun.scheduled_at).in_(queries.next_heads(list(dict.fromkeys(job_ids)))),
+            )
+            .returning(
+                queries.is_due(),
+            )
+            .execution_options(
+                synchronize_session=False,
+            )
+        )
+        return any((await get_current_session().scalars(query)).all())
+
+    @transactional
+    async def heartbeat_runs(self, request: HeartbeatJobRunsDto) -> HeartbeatJobRunsResultDto:
+        query = (
+            sa.update(
+                JobRun,
+            )
+            .values(
+                assigned_until=sa.func.now() + sa.literal(request.lease_duration, sa.Interval()),
+            )
+            .where(
+                JobRun.assigned_to == request.worker,
+                queries.has_status(JobRunStatus.IN_PROGRESS),
+                # Expired leases may be reaped and leased again at any time, so they can't be extended.
+                JobRun.assigned_until >= sa.func.now(),
+            )
+            .returning(JobRun.id)
+            .execution_options(
+                synchronize_session=False,
+            )
+        )
+        if request.ids is not None:
+            query = query.where(JobRun.id.in_(request.ids))
+
+        session = get_current_session()
+        extended = (await session.scalars(query)).all()
+        if request.ids is not None:
+            extended_ids = set(extended)
+            lost = [id for id in request.ids if id not in extended_ids]
+        else:
+            expired = sa.select(JobRun.id).where(
+                JobRun.assigned_to == request.worker,
+                queries.has_status(JobRunStatus.IN_PROGRESS),
+                JobRun.assigned_until < sa.func.now(),
+            )
+            lost = (await session.scalars(expired)).all()
+
+        return HeartbeatJobRunsResultDto(extended=extended, lost=lost)
 
     @transactional
     async def complete_run(self, id: UUID, request: CompleteJobRunDto) -> JobRunDto:
+        results = {id: _split_result(request.result)} if request.result is not None else {}
+        result_size = sum(map(len, results[id])) if results else None
         query = (
             sa.update(
                 JobRun,
             )
             .values(
                 status=JobRunStatus.COMPLETED,
-                result=request.result,
+                result_size=sa.func.coalesce(sa.literal(result_size, sa.BigInteger), JobRun.result_size),
                 completed_at=sa.func.now(),
             )
             .where(
@@ -122,16 +360,7 @@ class JobRunService:
                     JobRun.assigned_until >= sa.func.now(),
                 ),
             )
-            .returning(
-                JobRun.id,
-                JobRun.job_id,
-                JobRun.job_schedule_id,
-                JobRun.scheduled_at,
-                JobRun.assigned_to,
-                JobRun.assigned_until,
-                JobRun.status,
-                JobRun.result,
-            )
+            .returning(*_job_run_columns)
             .execution_options(
                 synchronize_session=False,
             )
@@ -139,13 +368,194 @@ class JobRunService:
 
         row = (await get_current_session().execute(query)).one_or_none()
         if row is None:
+            RUN_COMPLETION_FAILURES.labels(request.worker).inc()
             raise RunCompletionFailed(f"Failed to complete run {id}.")
 
-        job_schedule_id = row["job_schedule_id"]
-        if job_schedule_id is not None:
-            await self._schedule_next_run(job_schedule_id)
+        await self._replace_results(results)
+        run = _with_result_url(JobRunDto.construct(**row._mapping))
+        await run_notifier.publish(_run_events(RunEventType.COMPLETED, [run]))
+        return run
 
-        return JobRunDto(**{k: row[k] for k in row.keys()})
+    @transactional
+    async def complete_runs(self, requests: List[CompleteJobRunBatchItemDto]) -> List[BatchItemResultDto[JobRunDto]]:
+        unique_requests = {}
+        for request in requests:
+            unique_requests.setdefault(request.id, request)
+
+        results = {r.id: _split_result(r.result) for r in unique_requests.values() if r.result is not None}
+        completions = sa.values(
+            sa.column("id", sap.UUID(as_uuid=True)),
+            sa.column("worker", sa.String),
+            sa.column("result_size", sa.BigInteger),
+            name="completions",
+        ).data(
+            [
+                (r.id, r.worker, sum(map(len, results[r.id])) if r.id in results else None)
+                for r in unique_requests.values()
+            ]
+        )
+        query = (
+            sa.update(
+                JobRun,
+            )
+            .values(
+                status=JobRunStatus.COMPLETED,
+                result_size=sa.func.coalesce(sa.cast(completions.c.result_size, sa.BigInteger), JobRun.result_size),
+                completed_at=sa.func.now(),
+            )
+            .where(
+                sa.and_(
+                    JobRun.id == completions.c.id,
+                    JobRun.status == JobRunStatus.IN_PROGRESS,
+                    JobRun.assigned_to == completions.c.worker,
+                    JobRun.assigned_until >= sa.func.now(),
+                ),
+            )
+            .returning(*_job_run_columns)
+            .execution_options(
+                synchronize_session=False,
+            )
+        )
+
+        rows = (await get_current_session().execute(query)).all()
+        runs = {row["id"]: _with_result_url(JobRunDto.construct(**row._mapping)) for row in rows}
+        await self._replace_results({id: chunks for id, chunks in results.items() if id in runs})
+        await run_notifier.publish(_run_events(RunEventType.COMPLETED, runs.values()))
+
+        results = []
+        for request in requests:
+            if unique_requests.pop(request.id, None) is None:
+                results.append(BatchItemResultDto(id=request.id, error=f"Run {request.id} is completed twice."))
+            elif request.id not in runs:
+                RUN_COMPLETION_FAILURES.labels(request.worker).inc()
+                results.append(BatchItemResultDto(id=request.id, error=f"Failed to complete run {request.id}."))
+            else:
+                results.append(BatchItemResultDto(id=request.id, result=runs[request.id]))
+
+        return results
+
+    async def upload_result(self, id: UUID, worker: str, content: AsyncIterator[bytes]) -> JobRunDto:
+        # Chunks are staged under negative indexes in short transactions while the upload streams in, the run is only
+        # locked at the end to swap them in.
+        await self._clear_staged_result(id, worker)
+        try:
+            size, index, buffer = 0, 0, bytearray()
+            async for data in content:
+                size += len(data)
+                if size > MAX_RUN_RESULT_SIZE:
+                    raise ResultTooLargeError(f"Run results can't be larger than {MAX_RUN_RESULT_SIZE} bytes.")
+
+                buffer += data
+                while len(buffer) >= RUN_RESULT_CHUNK_SIZE:
+                    await self._stage_result_chunk(id, index, bytes(buffer[:RUN_RESULT_CHUNK_SIZE]))
+                    del buffer[:RUN_RESULT_CHUNK_SIZE]
+                    index += 1
+
+            if buffer:
+                await self._stage_result_chunk(id, index, bytes(buffer))
+
+            return await self._swap_staged_result(id, worker, size)
+        except Exception:
+            await self._delete_staged_result(id)
+            raise
+
+    async def _check_lease(self, id: UUID, worker: str, lock: bool):
+        query = sa.select(JobRun.id).where(
+            JobRun.id == id,
+            queries.has_status(JobRunStatus.IN_PROGRESS),
+            JobRun.assigned_to == worker,
+            JobRun.assigned_until >= sa.func.now(),
+        )
+        if await get_current_session().scalar(query.with_for_update() if lock else query) is None:
+            RUN_COMPLETION_FAILURES.labels(worker).inc()
+            raise RunCompletionFailed(f"Failed to upload the result of run {id}.")
+
+    @transactional
+    async def _clear_staged_result(self, id: UUID, worker: str):
+        await self._check_lease(id, worker, lock=False)
+        await self._delete_staged_result(id)
+
+    @transactional
+    async def _delete_staged_result(self, id: UUID):
+        await get_current_session().execute(
+            sa.delete(JobRunResultChunk).where(JobRunResultChunk.run_id == id, JobRunResultChunk.index < 0)
+        )
+
+    @transactional
+    async def _stage_result_chunk(self, id: UUID, index: int, data: bytes):
+        await get_current_session().insert_many(JobRunResultChunk, [{"run_id": id, "index": -1 - index, "data": data}])
+
+    @transactional
+    async def _swap_staged_result(self, id: UUID, worker: str, size: int) -> JobRunDto:
+        session = get_current_session()
+        # Locking the run keeps the lease reaper away while the result is being swapped in.
+        await self._check_lease(id, worker, lock=True)
+        await session.execute(
+            sa.delete(JobRunResultChunk).where(JobRunResultChunk.run_id == id, JobRunResultChunk.index >= 0)
+        )
+        await session.execute(
+            sa.update(JobRunResultChunk)
+            .values(index=-1 - JobRunResultChunk.index)
+            .where(JobRunResultChunk.run_id == id, JobRunResultChunk.index < 0)
+            .execution_options(synchronize_session=False)
+        )
+
+        query = (
+            sa.update(
+                JobRun,
+            )
+            .values(
+                result_size=size,
+            )
+            .where(
+                JobRun.id == id,
+            )
+            .returning(*_job_run_columns)
+            .execution_options(
+                synchronize_session=False,
+            )
+        )
+        row = (await session.execute(query)).one()
+        return _with_result_url(JobRunDto.construct(**row._mapping))
+
+    async def get_result(self, id: UUID) -> Tuple[int, AsyncIterator[bytes]]:
+        size = await get_read_session().scalar(sa.select(JobRun.result_size).where(JobRun.id == id))
+        if size is None:
+            raise NotFoundError(f"Could not find the result of job run {id}.")
+
+        return size, self._iter_result_chunks(id)
+
+    async def _iter_result_chunks(self, id: UUID) -> AsyncIterator[bytes]:
+        # Chunks are fetched one by one so that only one of them is held in memory at a time.
+        session = get_read_session()
+        index = 0
+        while True:
+            data = await session.scalar(
+                sa.select(JobRunResultChunk.data).where(
+                    JobRunResultChunk.run_id == id,
+                    JobRunResultChunk.index == index,
+                )
+            )
+            if data is None:
+                return
+
+            yield data
+            index += 1
+
+    async def _replace_results(self, results: Dict[UUID, List[bytes]]):
+        if not results:
+            return
+
+        session = get_current_session()
+        await session.execute(sa.delete(JobRunResultChunk).where(JobRunResultChunk.run_id.in_(list(results))))
+        await session.insert_many(
+            JobRunResultChunk,
+            [
+                {"run_id": id, "index": index, "data": data}
+                for id, chunks in results.items()
+                for index, data in enumerate(chunks)
+            ],
+        )
 
     @transactional
     async def schedule_runs(self, schedules: List[JobSchedule]):
@@ -153,21 +563,186 @@ class JobRunService:
             JobRun.create(job=s.job, job_schedule=s, scheduled_at=self._get_next_trigger_time(s.cron))
             for s in schedules
         ]
+        heads = set()
+        for run in sorted(runs, key=operator.attrgetter("scheduled_at")):
+            if run.job_id not in heads:
+                run.fair_share_at = run.scheduled_at
+                heads.add(run.job_id)
+
         get_current_session().add_all(runs)
+        await run_notifier.notify()
+        await run_notifier.publish(_run_events(RunEventType.SCHEDULED, runs))
+
+    @transactional
+    async def bulk_schedule_runs(self, jobs: List[JobDto]):
+        rows = [
+            self._make_run_row(j.id, s.id, j.queue, j.priority, self._get_next_trigger_time(s.cron))
+            for j in jobs
+            for s in j.schedules
+        ]
+        _set_heads(rows, set())
+        await get_current_session().insert_many(JobRun, rows)
+        await run_notifier.notify()
+        await run_notifier.publish(
+            [
+                RunEventDto.construct(
+                    event=RunEventType.SCHEDULED, id=r["id"], job_id=r["job_id"], status=r["status"], assigned_to=None
+                )
+                for r in rows
+            ]
+        )
+
+    @transactional
+    async def materialize_runs(self, until: datetime, after: UUID | None, limit: int) -> UUID | None:
+        """Materializes the runs of a batch of schedules, returning where the next batch starts.
 
-    async def _schedule_next_run(self, id: UUID):
+        Returns None once done, or when another process is materializing runs.
+        """
         session = get_current_session()
-        job_schedule = await session.get(JobSchedule, id, options=[sao.joinedload(JobSchedule.job)])
+        if not await session.scalar(sa.select(sa.func.pg_try_advisory_xact_lock(RUN_MATERIALIZER_LOCK))):
+            return None
 
-        await self.schedule_runs([job_schedule])
+        last_scheduled_at = (
+            sa.select(sa.func.max(JobRun.scheduled_at))
+            .where(JobRun.job_schedule_id == JobSchedule.id)
+            .scalar_subquery()
+        )
+        query = (
+            sa.select(
+                JobSchedule.id,
+                JobSchedule.job_id,
+                JobSchedule.cron,
+                Job.queue,
+                Job.priority,
+                last_scheduled_at.label("last_scheduled_at"),
+            )
+            .join(Job, Job.id == JobSchedule.job_id)
+            .where(sa.not_(JobSchedule.exhausted))
+            .order_by(JobSchedule.id)
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(JobSchedule.id > after)
+
+        schedules = (await session.execute(query)).all()
+
+        now = datetime.utcnow()
+        rows, exhausted = [], []
+        for schedule in schedules:
+            last_scheduled_at = schedule["last_scheduled_at"]
+            after = max(last_scheduled_at or now, now)
+            try:
+                trigger_times = get_trigger_times_until(schedule["cron"], until, after)
+                if not trigger_times and not get_next_trigger_times(schedule["cron"], 1, after):
+                    logger.warning("Schedule %s with %s never triggers again.", schedule["id"], schedule["cron"])
+                    exhausted.append(schedule["id"])
+                    continue
+            except ValueError:
+                logger.warning("Schedule %s has an invalid cron expression %s.", schedule["id"], schedule["cron"])
+                exhausted.append(schedule["id"])
+                continue
+
+            rows.extend(
+                self._make_run_row(schedule["job_id"], schedule["id"], schedule["queue"], schedule["priority"], t)
+                for t in trigger_times
+            )
+
+        if rows:
+            # Locking the heads waits for the leases assigning them, these only replace them with the runs they see.
+            heads = (
+                sa.select(JobRun.job_id)
+                .where(queries.is_assignable(), queries.is_head(), JobRun.job_id.in_(list({r["job_id"] for r in rows})))
+                .with_for_update()
+            )
+            _set_heads(rows, set((await session.scalars(heads)).all()))
+            returning = (JobRun.id, JobRun.job_id, JobRun.status, JobRun.assigned_to)
+            inserted = await session.insert_many(JobRun, rows, ignore_conflicts=True, returning=returning)
+            await run_notifier.notify()
+            await run_notifier.publish(_run_events(RunEventType.SCHEDULED, inserted))
+
+        if exhausted:
+            await session.execute(
+                sa.update(JobSchedule)
+                .values(exhausted=True)
+                .where(JobSchedule.id.in_(exhausted))
+                .execution_options(synchronize_session=False)
+            )
+
+        return schedules[-1]["id"] if len(schedules) == limit else None
+
+    async def reap_expired_leases(self, batch_size: int) -> Dict[str, int]:
+        reclaimed = collections.Counter()
+        while True:
+            workers = await self._reap_expired_leases(batch_size)
+            reclaimed.update(workers)
+            if len(workers) < batch_size:
+                break
+
+        if reclaimed:
+            logger.info("Reclaimed expired leases: %s.", dict(reclaimed))
+
+        return dict(reclaimed)
+
+    @transactional
+    async def _reap_expired_leases(self, limit: int) -> List[str]:
+        expired = queries.expired_leases(limit).cte("expired_leases")
+        query = (
+            sa.update(
+                JobRun,
+            )
+            .values(
+                status=JobRunStatus.SCHEDULED,
+                assigned_to=None,
+                assigned_until=None,
+            )
+            .where(
+                JobRun.id == expired.c.id,
+                JobRun.scheduled_at == expired.c.scheduled_at,
+            )
+            .returning(JobRun.id, JobRun.job_id, JobRun.status, expired.c.assigned_to)
+            .execution_options(
+                synchronize_session=False,
+            )
+        )
+
+        rows = (await get_current_session().execute(query)).all()
+        if rows:
+            await run_notifier.notify()
+            await run_notifier.publish(_run_events(RunEventType.LEASE_EXPIRED, rows))
+
+        return [row.assigned_to for row in rows]
+
+    async def get_queue_stats(self) -> Dict[str, int]:
+        row = (await get_read_session().execute(queries.queue_stats())).one()
+        return dict(row._mapping)
+
+    @transactional
+    async def _get_next_run_delay(self, queues: List[str] | None) -> float | None:
+        delay = await get_current_session().scalar(queries.next_run_delay(queues))
+        return float(delay) if delay is not None else None
+
+    @staticmethod
+    def _make_run_row(job_id: UUID, job_schedule_id: UUID, queue: str, priority: int, scheduled_at: datetime) -> dict:
+        return {
+            "id": uuid.uuid4(),
+            "job_id": job_id,
+            "job_schedule_id": job_schedule_id,
+            "queue": queue,
+            "priority": priority,
+            "scheduled_at": scheduled_at,
+            "fair_share_at": None,
+            "completed_at": None,
+            "status": JobRunStatus.SCHEDULED,
+            "result_size": None,
+        }
 
     def _get_next_trigger_time(self, cron: str) -> datetime:
         try:
-            schedule = CronTab(cron)
+            (trigger_time,) = get_next_trigger_times(cron, 1)
         except ValueError:
             raise InvalidCronExpressionError(f"{cron} is not a valid cron expression.")
 
-        return schedule.next(default_utc=True, return_datetime=True)
+        return trigger_time
 
 
 class JobService:
@@ -176,27 +751,89 @@ class JobService:
 
     async def list_jobs(self, params: JobQueryParamsDto) -> Page[JobDto]:
         query = sa.select(Job).options(sao.selectinload(Job.schedules))
-        if params.sort is not None:
-            query = query.order_by(params.sort_order.apply(params.sort.column))
+        columns = [Job.id] if params.sort is None else [params.sort.column, Job.id]
+        items, next_cursor = await get_read_session().get_page(
+            query,
+            offset=params.offset,
+            limit=params.limit,
+            keyset=Keyset(*columns, descending=params.sort_order == SortOrder.DESCENDING),
+            cursor=params.cursor,
+        )
+        jobs = [JobDto.from_orm(j) for j in items]
+        for job in jobs:
+            job_cache.set(job.id, job)
 
-        items, count = await get_current_session().get_page(query, offset=params.offset, limit=params.limit)
-        return Page(count=count, results=[JobDto.from_orm(j) for j in items])
+        return Page(
+            count=await _count(query, params.count),
+            count_estimated=params.count == CountMode.ESTIMATE,
+            results=jobs,
+            next_cursor=next_cursor,
+        )
 
     async def get_job(self, id: UUID) -> JobDto:
-        job = await get_current_session().get(Job, id, options=[sao.selectinload(Job.schedules)])
+        cached_job = job_cache.get(id)
+        if cached_job is not None:
+            return cached_job
+
+        job = await get_read_session().get(Job, id, options=[sao.selectinload(Job.schedules)])
         if job is None:
             raise NotFoundError(f"Could not find job with id {id}")
 
-        return JobDto.from_orm(job)
+        job_dto = JobDto.from_orm(job)
+        job_cache.set(id, job_dto)
+        return job_dto
 
     @transactional
     async def create_job(self, request: JobRequestDto) -> JobDto:
-        job = Job.create(name=request.name)
+        job = Job.create(name=request.name, queue=request.queue, priority=request.priority)
         job_schedules = [JobSchedule.create(cron=s.cron, job=job) for s in request.schedules]
         job.schedules = job_schedules
 
         await self._run_service.schedule_runs(job_schedules)
 
         get_current_session().add(job)
+        job_cache.pop(job.id)
 
         return JobDto.from_orm(job)
+
+    @transactional
+    async def create_jobs(self, items: List[dict]) -> List[BatchItemResultDto[JobDto]]:
+        jobs, results = [], []
+        for item in items:
+            try:
+                request = JobRequestDto.parse_obj(item)
+            except pydantic.ValidationError as e:
+                errors = [f"{'.'.join(map(str, error['loc']))}: {error['msg'].rstrip('.')}" for error in e.errors()]
+                results.append(BatchItemResultDto(error=f"Invalid job: {'; '.join(errors)}."))
+                continue
+
+            job_id = uuid.uuid4()
+            job_schedules = [JobScheduleDto(id=uuid.uuid4(), job_id=job_id, cron=s.cron) for s in request.schedules]
+            jobs.append(
+                JobDto(
+                    id=job_id,
+                    name=request.name,
+                    queue=request.queue,
+                    priority=request.priority,
+                    schedules=job_schedules,
+                )
+            )
+            results.append(BatchItemResultDto(id=job_id, result=jobs[-1]))
+
+        if not jobs:
+            return results
+
+        job_schedules = [s for j in jobs for s in j.schedules]
+
+        session = get_current_session()
+        await session.insert_many(
+            Job, [{"id": j.id, "name": j.name, "queue": j.queue, "priority": j.priority} for j in jobs]
+        )
+        await session.insert_many(
+            JobSchedule, [{"id": s.id, "job_id": s.job_id, "cron": s.cron} for s in job_schedules]
+        )
+        await self._run_service.bulk_schedule_runs(jobs)
+        for job in jobs:
+            job_cache.pop(job.id)
+
+        return results
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import timedelta
+import logging
+from typing import Awaitable, Callable
+
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    def __init__(self, func: Callable[[], Awaitable], interval: timedelta):
+        self._func = func
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self._func()
+            except Exception:
+                logger.exception("Periodic task %s failed.", self._func.__qualname__)
+
+            await asyncio.sleep(self._interval.total_seconds())
+
+
+def register_periodic_task(app: FastAPI, task: PeriodicTask):
+    @app.on_event("startup")
+    async def start_periodic_task():
+        task.start()
+
+    @app.on_event("shutdown")
+    async def stop_periodic_task():
+        await task.stop()
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import subprocess
+import sys
+
+import orjson
+
+from benchmarks.client import AsgiClient
+from benchmarks.client import HttpClient
+from benchmarks.seed import reset
+from benchmarks.seed import seed
+from benchmarks.workload import run_workload
+from main import app
+
+
+def get_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.asynccontextmanager
+async def in_process_app():
+    await app.router.startup()
+    try:
+        yield app
+    finally:
+        await app.router.shutdown()
+
+
+async def main(args: argparse.Namespace) -> dict:
+    if args.reset:
+        await reset()
+
+    if args.jobs:
+        await seed(args.jobs, args.schedules_per_job, args.runs_per_schedule, args.queues)
+
+    workload = functools.partial(
+        run_workload,
+        workers=args.workers,
+        readers=args.readers,
+        mode=args.mode,
+        queues=args.queues,
+        duration=args.duration,
+    )
+    if args.url is None:
+        async with in_process_app() as app:
+            results = await workload(lambda: AsgiClient(app))
+    else:
+        results = await workload(lambda: HttpClient(args.url))
+
+    return {
+        "revision": get_revision(),
+        "parameters": vars(args),
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Seeds the database configured by DATABASE_URL and runs a worker and reader workload against it.",
+    )
+    parser.add_argument("--reset", action="store_true", help="truncate all tables before seeding")
+    parser.add_argument("--jobs", type=int, default=0, help="number of jobs to seed")
+    parser.add_argument("--schedules-per-job", type=int, default=1)
+    parser.add_argument("--runs-per-schedule", type=int, default=10, help="number of due runs to seed per schedule")
+    parser.add_argument(
+        "--queues",
+        type=int,
+        default=1,
+        help="number of queues to spread the seeded jobs and the workers over, 1 seeds the default queue only",
+    )
+    parser.add_argument("--workers", type=int, default=10, help="number of concurrent workers")
+    parser.add_argument("--readers", type=int, default=2, help="number of concurrent list_runs readers")
+    parser.add_argument(
+        "--mode",
+        choices=["assign", "lease"],
+        default="assign",
+        help="whether workers pick runs from a listing and assign them or lease them",
+    )
+    parser.add_argument("--duration", type=float, default=30, help="workload duration in seconds")
+    parser.add_argument(
+        "--url",
+        help="base url of a running server, for example http://localhost:8000; main:app is run in process if omitted",
+    )
+    parser.add_argument("--output", help="file to write the JSON report to instead of stdout")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = orjson.dumps(asyncio.run(main(args)), option=orjson.OPT_INDENT_2)
+    if args.output is None:
+        sys.stdout.buffer.write(report + b"\n")
+    else:
+        with open(args.output, "wb") as f:
+            f.write(report + b"\n")
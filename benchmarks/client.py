@@ -0,0 +1,114 @@
+import asyncio
+from typing import Any, Tuple
+from urllib.parse import urlsplit
+
+import orjson
+from starlette.types import ASGIApp
+
+
+class AsgiClient:
+    """Calls an ASGI application in process, bypassing the network stack."""
+
+    def __init__(self, app: ASGIApp):
+        self._app = app
+
+    async def request(self, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        path, _, query_string = path.partition("?")
+        content = orjson.dumps(body) if body is not None else b""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query_string.encode(),
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(content)).encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        request_sent = False
+        disconnected = asyncio.Event()
+        response = {"status": 500, "body": []}
+
+        async def receive():
+            nonlocal request_sent
+            if request_sent:
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            request_sent = True
+            return {"type": "http.request", "body": content, "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        try:
+            await self._app(scope, receive, send)
+        finally:
+            disconnected.set()
+
+        return response["status"], b"".join(response["body"])
+
+    async def close(self):
+        pass
+
+
+class HttpClient:
+    """Minimal keep-alive HTTP/1.1 client, one connection per client."""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def request(self, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+
+        content = orjson.dumps(body) if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self._host}:{self._port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            f"\r\n"
+        )
+        self._writer.write(head.encode() + content)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self._reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while size := int((await self._reader.readline()).strip(), 16):
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readline()
+
+            await self._reader.readline()
+            response_body = b"".join(chunks)
+        else:
+            response_body = await self._reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            await self.close()
+
+        return status, response_body
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._reader = self._writer = None
@@ -0,0 +1,62 @@
+from datetime import datetime
+from datetime import timedelta
+import uuid
+
+import sqlalchemy as sa
+
+from api.db import SessionLocal
+from api.models import DEFAULT_QUEUE
+from api.models import Job
+from api.models import JobRun
+from api.models import JobRunStatus
+from api.models import JobSchedule
+
+SEED_CRON = "0 0 * * *"
+SEED_CHUNK_SIZE = 1000
+
+
+async def reset():
+    async with SessionLocal() as session:
+        async with session.begin():
+            await session.execute(sa.text("TRUNCATE job_run_result_chunks, job_runs, job_schedules, jobs"))
+
+
+def get_queue(index: int, queues: int) -> str:
+    return DEFAULT_QUEUE if queues == 1 else f"benchmark-{index % queues}"
+
+
+async def seed(jobs: int, schedules_per_job: int, runs_per_schedule: int, queues: int):
+    """Creates jobs spread over the queues with due scheduled runs, one minute apart per schedule."""
+    first_scheduled_at = datetime.utcnow() - timedelta(minutes=runs_per_schedule + 1)
+    for offset in range(0, jobs, SEED_CHUNK_SIZE):
+        job_rows, schedule_rows, run_rows = [], [], []
+        for index in range(offset, min(offset + SEED_CHUNK_SIZE, jobs)):
+            job_id, queue = uuid.uuid4(), get_queue(index, queues)
+            job_rows.append({"id": job_id, "name": f"benchmark-{index}", "queue": queue})
+            for schedule_index in range(schedules_per_job):
+                schedule_id = uuid.uuid4()
+                schedule_rows.append({"id": schedule_id, "job_id": job_id, "cron": SEED_CRON})
+                run_rows.extend(
+                    {
+                        "id": uuid.uuid4(),
+                        "job_id": job_id,
+                        "job_schedule_id": schedule_id,
+                        "queue": queue,
+                        "scheduled_at": first_scheduled_at + timedelta(minutes=i),
+                        "fair_share_at": first_scheduled_at if schedule_index == i == 0 else None,
+                        "completed_at": None,
+                        "status": JobRunStatus.SCHEDULED,
+                        "result_size": None,
+                    }
+                    for i in range(runs_per_schedule)
+                )
+
+        async with SessionLocal() as session:
+            async with session.begin():
+                await session.insert_many(Job, job_rows)
+                await session.insert_many(JobSchedule, schedule_rows)
+                await session.insert_many(JobRun, run_rows)
+
+    async with SessionLocal() as session:
+        await session.execute(sa.text("ANALYZE jobs, job_schedules, job_runs"))
+        await session.commit()
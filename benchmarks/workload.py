@@ -0,0 +1,150 @@
+import asyncio
+import collections
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import orjson
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.seed import get_queue
+
+READ_PAGE_SIZE = 100
+CANDIDATE_PAGE_SIZE = 20
+LEASE_DURATION = 60
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = collections.defaultdict(list)
+        self.errors: Dict[str, int] = collections.Counter()
+
+    async def call(self, operation: str, request: Callable[[], Awaitable]) -> tuple:
+        started_at = time.perf_counter()
+        status, body = await request()
+        self.latencies[operation].append(time.perf_counter() - started_at)
+        if status >= 400:
+            self.errors[operation] += 1
+
+        return status, body
+
+    def report(self, duration: float) -> dict:
+        return {
+            operation: {
+                "count": len(latencies),
+                "errors": self.errors[operation],
+                "throughput": len(latencies) / duration,
+                "p50": _percentile(latencies, 0.5),
+                "p99": _percentile(latencies, 0.99),
+            }
+            for operation, latencies in sorted(self.latencies.items())
+        }
+
+
+def _percentile(values: List[float], fraction: float) -> float | None:
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_worker(client, recorder: Recorder, worker: str, mode: str, queue: str | None, deadline: float):
+    queues = {"queues": [queue]} if queue is not None else {}
+    queue_filter = f"&queue={queue}" if queue is not None else ""
+    while time.monotonic() < deadline:
+        if mode == "lease":
+            _, body = await recorder.call(
+                "lease",
+                lambda: client.request(
+                    "POST",
+                    "/v1/runs/lease",
+                    {"worker": worker, "lease_duration": LEASE_DURATION, "limit": 1, "wait": 1, **queues},
+                ),
+            )
+            run_ids = [r["id"] for r in orjson.loads(body)]
+        else:
+            _, body = await recorder.call(
+                "candidates",
+                lambda: client.request(
+                    "GET",
+                    f"/v1/runs?assignable_only=true&sort=priority&limit={CANDIDATE_PAGE_SIZE}&count=none{queue_filter}",
+                ),
+            )
+            candidates = orjson.loads(body)["results"]
+            if not candidates:
+                await asyncio.sleep(0.1)
+                continue
+
+            run_id = random.choice(candidates)["id"]
+            status, _ = await recorder.call(
+                "assign",
+                lambda: client.request(
+                    "POST",
+                    f"/v1/runs/{run_id}/assign",
+                    {"worker": worker, "lease_duration": LEASE_DURATION, **queues},
+                ),
+            )
+            run_ids = [run_id] if status == 200 else []
+
+        for run_id in run_ids:
+            await recorder.call(
+                "complete",
+                lambda: client.request("POST", f"/v1/runs/{run_id}/complete", {"worker": worker, "result": "ok"}),
+            )
+
+
+async def run_reader(client, recorder: Recorder, deadline: float):
+    while time.monotonic() < deadline:
+        await recorder.call("list_runs", lambda: client.request("GET", f"/v1/runs?limit={READ_PAGE_SIZE}"))
+
+
+async def get_statement_counts(client) -> Dict[str, float]:
+    _, body = await client.request("GET", "/metrics")
+    counts = collections.Counter()
+    for family in text_string_to_metric_families(body.decode()):
+        if family.name == "db_statement_duration_seconds":
+            for sample in family.samples:
+                if sample.name.endswith("_count"):
+                    counts[sample.labels["operation"]] += sample.value
+
+    return counts
+
+
+async def run_workload(
+    make_client: Callable, workers: int, readers: int, mode: str, queues: int, duration: float
+) -> dict:
+    clients = [make_client() for _ in range(workers + readers + 1)]
+    metrics_client = clients.pop()
+    statements_before = await get_statement_counts(metrics_client)
+
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *[
+            run_worker(c, recorder, f"worker-{i}", mode, get_queue(i, queues) if queues > 1 else None, deadline)
+            for i, c in enumerate(clients[:workers])
+        ],
+        *[run_reader(c, recorder, deadline) for c in clients[workers:]],
+    )
+    elapsed = time.perf_counter() - started_at
+
+    statements_after = await get_statement_counts(metrics_client)
+    for client in [*clients, metrics_client]:
+        await client.close()
+
+    operations = recorder.report(elapsed)
+    assignments = operations.get("assign", {"count": 0, "errors": 0})
+    completed = operations.get("complete", {"count": 0, "errors": 0})
+    return {
+        "duration": elapsed,
+        "completed_runs": completed["count"] - completed["errors"],
+        "run_throughput": (completed["count"] - completed["errors"]) / elapsed,
+        "assignment_conflict_rate": assignments["errors"] / assignments["count"] if assignments["count"] else None,
+        "operations": operations,
+        "statements": {
+            operation: statements_after[operation] - statements_before[operation]
+            for operation in sorted(statements_after)
+        },
+    }
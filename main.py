@@ -1,11 +1,24 @@
 from fastapi import FastAPI
 
 from api.errors import register_error_handlers
+from api.materializer import register_run_materializer
+from api.metrics import register_metrics
 from api.middleware import register_middleware
+from api.notifications import register_run_notifier
+from api.partitions import register_partition_maintenance
+from api.queue_metrics import register_queue_metrics
+from api.reaper import register_lease_reaper
+from api.responses import DtoResponse
 from api.router import router
 
-app = FastAPI()
+app = FastAPI(default_response_class=DtoResponse)
 app.include_router(router)
 
 register_error_handlers(app)
 register_middleware(app)
+register_metrics(app)
+register_run_notifier(app)
+register_run_materializer(app)
+register_lease_reaper(app)
+register_queue_metrics(app)
+register_partition_maintenance(app)
@@ -0,0 +1,26 @@
+from typing import List
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def get_partitions(table: str) -> List[str]:
+    query = sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+    )
+    return op.get_bind().scalars(query, {"table": table}).all()
+
+
+def create_partitioned_index(table: str, name: str, columns: List[str], where: str | None = None):
+    """Builds the index on each partition concurrently and attaches them, must run in an autocommit block.
+
+    Partitioned indexes can't be built concurrently themselves.
+    """
+    columns_sql = ", ".join(columns)
+    where_sql = f" WHERE {where}" if where else ""
+    op.execute(f"CREATE INDEX {name} ON ONLY {table} ({columns_sql}){where_sql}")
+    for partition in get_partitions(table):
+        partition_index = f"{partition}_{name.removeprefix(f'ix_{table}_')}_idx"
+        op.execute(f"CREATE INDEX CONCURRENTLY {partition_index} ON {partition} ({columns_sql}){where_sql}")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
@@ -0,0 +1,47 @@
+"""run result chunks
+
+Revision ID: 2e7b9d4c8a13
+Revises: 9c4f7a1e2b58
+Create Date: 2026-10-17 20:11:37.502946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "2e7b9d4c8a13"
+down_revision = "9c4f7a1e2b58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_run_result_chunks",
+        sa.Column("run_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("index", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("run_id", "index"),
+    )
+    op.add_column("job_runs", sa.Column("result_size", sa.BigInteger(), nullable=True))
+    op.execute(
+        "INSERT INTO job_run_result_chunks (run_id, index, data) "
+        "SELECT id, 0, convert_to(result, 'UTF8') FROM job_runs WHERE result IS NOT NULL"
+    )
+    op.execute("UPDATE job_runs SET result_size = octet_length(convert_to(result, 'UTF8')) WHERE result IS NOT NULL")
+    op.drop_column("job_runs", "result")
+
+
+def downgrade() -> None:
+    op.add_column("job_runs", sa.Column("result", sa.Text(), nullable=True))
+    op.execute(
+        "UPDATE job_runs SET result = results.result "
+        "FROM ("
+        "SELECT run_id, convert_from(string_agg(data, '' ORDER BY index), 'UTF8') AS result "
+        "FROM job_run_result_chunks GROUP BY run_id"
+        ") AS results "
+        "WHERE job_runs.id = results.run_id"
+    )
+    op.drop_column("job_runs", "result_size")
+    op.drop_table("job_run_result_chunks")
@@ -0,0 +1,36 @@
+"""keyset pagination indexes
+
+Revision ID: 3f9c2b7d41e6
+Revises: a082d45a0eb5
+Create Date: 2026-10-17 10:12:31.512083
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f9c2b7d41e6"
+down_revision = "a082d45a0eb5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_jobs_name_id", "jobs", ["name", "id"], unique=False, postgresql_concurrently=True)
+        op.create_index(
+            "ix_job_runs_scheduled_at_id",
+            "job_runs",
+            ["scheduled_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_job_runs_scheduled_at", table_name="job_runs", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_job_runs_scheduled_at", "job_runs", ["scheduled_at"], unique=False, postgresql_concurrently=True
+        )
+        op.drop_index("ix_job_runs_scheduled_at_id", table_name="job_runs", postgresql_concurrently=True)
+        op.drop_index("ix_jobs_name_id", table_name="jobs", postgresql_concurrently=True)
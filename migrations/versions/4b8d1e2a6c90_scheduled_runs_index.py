@@ -0,0 +1,41 @@
+"""scheduled runs index
+
+Revision ID: 4b8d1e2a6c90
+Revises: e8a3b5c07f14
+Create Date: 2026-10-17 15:02:51.774620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "4b8d1e2a6c90"
+down_revision = "e8a3b5c07f14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_job_runs_scheduled_scheduled_at_id",
+            "job_runs",
+            ["scheduled_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("status = 'SCHEDULED'"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_job_runs_pending_scheduled_at_id", table_name="job_runs", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_job_runs_pending_scheduled_at_id",
+            "job_runs",
+            ["scheduled_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("status IN ('SCHEDULED', 'IN_PROGRESS')"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_job_runs_scheduled_scheduled_at_id", table_name="job_runs", postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""run filter indexes
+
+Revision ID: 5a1c8e3f9d27
+Revises: 2e7b9d4c8a13
+Create Date: 2026-10-17 21:40:18.093571
+
+"""
+from alembic import op
+
+from migrations.partitioned_indexes import create_partitioned_index
+
+# revision identifiers, used by Alembic.
+revision = "5a1c8e3f9d27"
+down_revision = "2e7b9d4c8a13"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_job_runs_job_id_scheduled_at_id": ["job_id", "scheduled_at", "id"],
+    "ix_job_runs_status_scheduled_at_id": ["status", "scheduled_at", "id"],
+    "ix_job_runs_assigned_to_scheduled_at_id": ["assigned_to", "scheduled_at", "id"],
+    "ix_job_runs_completed_at_id": ["completed_at", "id"],
+}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            create_partitioned_index("job_runs", name, columns)
+
+        op.drop_index("ix_job_runs_job_id", table_name="job_runs")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        create_partitioned_index("job_runs", "ix_job_runs_job_id", ["job_id"])
+        for name in INDEXES:
+            op.drop_index(name, table_name="job_runs")
@@ -0,0 +1,34 @@
+"""unique schedule runs
+
+Revision ID: 7d2e4f61a9c3
+Revises: c51e0a9d8b27
+Create Date: 2026-10-17 13:05:44.907126
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7d2e4f61a9c3"
+down_revision = "c51e0a9d8b27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_job_runs_job_schedule_id_scheduled_at",
+            "job_runs",
+            ["job_schedule_id", "scheduled_at"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_job_runs_job_schedule_id_scheduled_at",
+            table_name="job_runs",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,34 @@
+"""job queues
+
+Revision ID: 8f3a6c2d5e71
+Revises: 5a1c8e3f9d27
+Create Date: 2026-10-17 23:12:47.520913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.partitioned_indexes import create_partitioned_index
+
+# revision identifiers, used by Alembic.
+revision = "8f3a6c2d5e71"
+down_revision = "5a1c8e3f9d27"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_job_runs_scheduled_queue_scheduled_at_id"
+
+
+def upgrade() -> None:
+    # A constant default doesn't rewrite the tables.
+    op.add_column("jobs", sa.Column("queue", sa.String(length=100), server_default="default", nullable=False))
+    op.add_column("job_runs", sa.Column("queue", sa.String(length=100), server_default="default", nullable=False))
+
+    with op.get_context().autocommit_block():
+        create_partitioned_index("job_runs", INDEX, ["queue", "scheduled_at", "id"], "status = 'SCHEDULED'")
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX, table_name="job_runs")
+    op.drop_column("job_runs", "queue")
+    op.drop_column("jobs", "queue")
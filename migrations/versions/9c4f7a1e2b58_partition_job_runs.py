@@ -0,0 +1,124 @@
+"""partition job runs
+
+Revision ID: 9c4f7a1e2b58
+Revises: 4b8d1e2a6c90
+Create Date: 2026-10-17 18:24:09.361204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "9c4f7a1e2b58"
+down_revision = "4b8d1e2a6c90"
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 3
+
+COLUMNS = "id, job_id, job_schedule_id, scheduled_at, completed_at, assigned_to, assigned_until, status, result"
+# Runs without a scheduled time were always due, but the partition key can't be null.
+UPGRADED_COLUMNS = COLUMNS.replace("scheduled_at", "coalesce(scheduled_at, timezone('utc', now()))")
+
+
+def create_job_runs_table(name: str, partitioned: bool):
+    op.create_table(
+        name,
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("job_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("job_schedule_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("scheduled_at", sa.DateTime(), nullable=not partitioned),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("assigned_to", sa.String(length=100), nullable=True),
+        sa.Column("assigned_until", sa.DateTime(), nullable=True),
+        sa.Column("status", postgresql.ENUM(name="jobrunstatus", create_type=False), nullable=True),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"]),
+        sa.ForeignKeyConstraint(["job_schedule_id"], ["job_schedules.id"]),
+        sa.PrimaryKeyConstraint("id", "scheduled_at") if partitioned else sa.PrimaryKeyConstraint("id"),
+        postgresql_partition_by="RANGE (scheduled_at)" if partitioned else None,
+    )
+
+
+def create_job_runs_indexes(name: str):
+    op.create_index("ix_job_runs_job_id", name, ["job_id"], unique=False)
+    op.create_index("ix_job_runs_scheduled_at_id", name, ["scheduled_at", "id"], unique=False)
+    op.create_index("ix_job_runs_job_schedule_id_scheduled_at", name, ["job_schedule_id", "scheduled_at"], unique=True)
+    op.create_index(
+        "ix_job_runs_scheduled_scheduled_at_id",
+        name,
+        ["scheduled_at", "id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'SCHEDULED'"),
+    )
+    op.create_index(
+        "ix_job_runs_in_progress_assigned_until",
+        name,
+        ["assigned_until"],
+        unique=False,
+        postgresql_where=sa.text("status = 'IN_PROGRESS'"),
+    )
+    op.create_index(
+        "ix_job_runs_in_progress_assigned_to",
+        name,
+        ["assigned_to"],
+        unique=False,
+        postgresql_where=sa.text("status = 'IN_PROGRESS'"),
+    )
+
+
+def drop_job_runs_indexes(name: str):
+    for index in (
+        "ix_job_runs_job_id",
+        "ix_job_runs_scheduled_at_id",
+        "ix_job_runs_job_schedule_id_scheduled_at",
+        "ix_job_runs_scheduled_scheduled_at_id",
+        "ix_job_runs_in_progress_assigned_until",
+        "ix_job_runs_in_progress_assigned_to",
+    ):
+        op.drop_index(index, table_name=name)
+
+
+def next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE job_runs RENAME TO job_runs_unpartitioned")
+    op.execute("ALTER TABLE job_runs_unpartitioned DROP CONSTRAINT job_runs_pkey")
+    drop_job_runs_indexes("job_runs_unpartitioned")
+
+    create_job_runs_table("job_runs", partitioned=True)
+    create_job_runs_indexes("job_runs")
+    op.execute("CREATE TABLE job_runs_default PARTITION OF job_runs DEFAULT")
+
+    # Monthly partitions from the oldest run up to a few months ahead, the application creates the later ones.
+    now = datetime.utcnow()
+    oldest = op.get_bind().scalar(sa.text("SELECT min(scheduled_at) FROM job_runs_unpartitioned")) or now
+    month, last_month = datetime(oldest.year, oldest.month, 1), datetime(now.year, now.month, 1)
+    for _ in range(PARTITIONS_AHEAD):
+        last_month = next_month(last_month)
+
+    while month <= last_month:
+        op.execute(
+            f"CREATE TABLE job_runs_p{month:%Y%m} PARTITION OF job_runs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        )
+        month = next_month(month)
+
+    op.execute(f"INSERT INTO job_runs ({COLUMNS}) SELECT {UPGRADED_COLUMNS} FROM job_runs_unpartitioned")
+    op.drop_table("job_runs_unpartitioned")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE job_runs RENAME TO job_runs_partitioned")
+    op.execute("ALTER TABLE job_runs_partitioned DROP CONSTRAINT job_runs_pkey")
+    drop_job_runs_indexes("job_runs_partitioned")
+
+    create_job_runs_table("job_runs", partitioned=False)
+    create_job_runs_indexes("job_runs")
+    op.execute(f"INSERT INTO job_runs ({COLUMNS}) SELECT {COLUMNS} FROM job_runs_partitioned")
+    op.drop_table("job_runs_partitioned")
@@ -0,0 +1,75 @@
+"""run priorities
+
+Revision ID: b6e1d9a4f352
+Revises: 8f3a6c2d5e71
+Create Date: 2026-10-18 01:05:33.184526
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.partitioned_indexes import create_partitioned_index
+
+# revision identifiers, used by Alembic.
+revision = "b6e1d9a4f352"
+down_revision = "8f3a6c2d5e71"
+branch_labels = None
+depends_on = None
+
+HEAD = "status = 'SCHEDULED' AND fair_share_at IS NOT NULL"
+INDEXES = {
+    "ix_job_runs_scheduled_priority_scheduled_at_id": (["priority", "scheduled_at", "id"], "status = 'SCHEDULED'"),
+    "ix_job_runs_scheduled_queue_assignment_order": (
+        ["queue", "priority", "fair_share_at", "scheduled_at", "id"],
+        HEAD,
+    ),
+    "ix_job_runs_head_job_id": (["job_id"], HEAD),
+    "ix_job_runs_waiting_job_id_scheduled_at_id": (
+        ["job_id", "scheduled_at", "id"],
+        "status = 'SCHEDULED' AND fair_share_at IS NULL",
+    ),
+}
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_heads():
+    # Makes the first scheduled run of each job its head, a batch of jobs at a time, each committed on its own.
+    query = sa.text(
+        "WITH batch AS (SELECT id FROM jobs WHERE id > CAST(:id AS uuid) ORDER BY id LIMIT :limit), "
+        "heads AS ("
+        "SELECT run.id, run.scheduled_at FROM batch CROSS JOIN LATERAL ("
+        "SELECT id, scheduled_at FROM job_runs WHERE job_id = batch.id AND status = 'SCHEDULED' "
+        "AND fair_share_at IS NULL ORDER BY scheduled_at, id LIMIT 1"
+        ") run"
+        "), updated AS ("
+        "UPDATE job_runs SET fair_share_at = job_runs.scheduled_at FROM heads "
+        "WHERE job_runs.id = heads.id AND job_runs.scheduled_at = heads.scheduled_at"
+        ") SELECT id FROM batch ORDER BY id DESC LIMIT 1"
+    )
+    last = uuid.UUID(int=0)
+    while last is not None:
+        last = op.get_bind().execute(query, {"id": last, "limit": BACKFILL_BATCH_SIZE}).scalar()
+
+
+def upgrade() -> None:
+    op.add_column("jobs", sa.Column("priority", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("job_runs", sa.Column("priority", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("job_runs", sa.Column("fair_share_at", sa.DateTime(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        for name, (columns, where) in INDEXES.items():
+            create_partitioned_index("job_runs", name, columns, where)
+
+        backfill_heads()
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name="job_runs")
+
+    op.drop_column("job_runs", "fair_share_at")
+    op.drop_column("job_runs", "priority")
+    op.drop_column("jobs", "priority")
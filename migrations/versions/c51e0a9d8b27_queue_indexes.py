@@ -0,0 +1,41 @@
+"""queue indexes
+
+Revision ID: c51e0a9d8b27
+Revises: 3f9c2b7d41e6
+Create Date: 2026-10-17 11:40:07.218349
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c51e0a9d8b27"
+down_revision = "3f9c2b7d41e6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_job_runs_pending_scheduled_at_id",
+            "job_runs",
+            ["scheduled_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("status IN ('SCHEDULED', 'IN_PROGRESS')"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_job_runs_in_progress_assigned_until",
+            "job_runs",
+            ["assigned_until"],
+            unique=False,
+            postgresql_where=sa.text("status = 'IN_PROGRESS'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_job_runs_in_progress_assigned_until", table_name="job_runs", postgresql_concurrently=True)
+        op.drop_index("ix_job_runs_pending_scheduled_at_id", table_name="job_runs", postgresql_concurrently=True)
@@ -0,0 +1,41 @@
+"""partial run filter indexes
+
+Revision ID: d2f8b4a6c193
+Revises: b6e1d9a4f352
+Create Date: 2026-10-18 02:12:47.530918
+
+"""
+from alembic import op
+
+from migrations.partitioned_indexes import create_partitioned_index
+
+# revision identifiers, used by Alembic.
+revision = "d2f8b4a6c193"
+down_revision = "b6e1d9a4f352"
+branch_labels = None
+depends_on = None
+
+ASSIGNED_INDEX = "ix_job_runs_assigned_assigned_to_scheduled_at_id"
+DROPPED_INDEXES = {
+    "ix_job_runs_status_scheduled_at_id": ["status", "scheduled_at", "id"],
+    "ix_job_runs_assigned_to_scheduled_at_id": ["assigned_to", "scheduled_at", "id"],
+}
+
+
+def upgrade() -> None:
+    # Every index a run update changes takes a new entry. Status filters are served by the partial status indexes and
+    # the scheduled_at one, and runs only get a worker once leased.
+    with op.get_context().autocommit_block():
+        create_partitioned_index(
+            "job_runs", ASSIGNED_INDEX, ["assigned_to", "scheduled_at", "id"], "assigned_to IS NOT NULL"
+        )
+        for name in DROPPED_INDEXES:
+            op.drop_index(name, table_name="job_runs")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in DROPPED_INDEXES.items():
+            create_partitioned_index("job_runs", name, columns)
+
+        op.drop_index(ASSIGNED_INDEX, table_name="job_runs")
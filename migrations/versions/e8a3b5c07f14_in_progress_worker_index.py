@@ -0,0 +1,32 @@
+"""in progress worker index
+
+Revision ID: e8a3b5c07f14
+Revises: 7d2e4f61a9c3
+Create Date: 2026-10-17 14:21:09.330512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e8a3b5c07f14"
+down_revision = "7d2e4f61a9c3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_job_runs_in_progress_assigned_to",
+            "job_runs",
+            ["assigned_to"],
+            unique=False,
+            postgresql_where=sa.text("status = 'IN_PROGRESS'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_job_runs_in_progress_assigned_to", table_name="job_runs", postgresql_concurrently=True)
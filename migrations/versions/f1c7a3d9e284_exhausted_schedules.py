@@ -0,0 +1,23 @@
+"""exhausted schedules
+
+Revision ID: f1c7a3d9e284
+Revises: d2f8b4a6c193
+Create Date: 2026-10-18 03:27:15.604382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f1c7a3d9e284"
+down_revision = "d2f8b4a6c193"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("job_schedules", sa.Column("exhausted", sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("job_schedules", "exhausted")
@@ -0,0 +1,3 @@
+#!/bin/sh -e
+
+exec poetry run python -m benchmarks "$@"